@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+
+# Geschlossenes Dreiecksnetz des Geländekörpers.
+
+# DXF, CAD-Skript mit 3D-Flächen und STL beschreiben alle dieselbe Hülle:
+# die Geländeoberfläche, vier senkrechte Seitenwände bis zur Höhe minh und
+# die Unterseite. Das Netz wird einmal als Punkt- und Dreieckstabelle
+# aufgebaut, die Ausgabefunktionen in Exporte.py schreiben es nur noch
+# im jeweiligen Format.
+
+# Alle Dreiecke sind von außen gesehen gegen den Uhrzeigersinn orientiert,
+# die Normalen zeigen also aus dem Körper heraus. Die Koordinaten sind wie
+# in allen Ausgabedateien relativ zur Südwestecke des Rasters.
+
+import numpy as np
+
+
+class Dreiecksnetz:
+    """Punkte (n×3) und Dreiecke (m×3, Indizes in punkte) des Geländekörpers
+
+    Als Teilnetz eines Streifennetzes sind nummern die Nummern seiner
+    Punkte im ganzen Netz, und erst ab punkte[neu] kommen Punkte, die
+    kein früheres Teilnetz schon hatte."""
+
+    def __init__(self, punkte, dreiecke, teile, minh, nummern=None, neu=0):
+        self.punkte = punkte
+        self.dreiecke = dreiecke
+        # Bereiche der Dreieckstabelle: "oben", "seiten", "unten"
+        self.teile = teile
+        self.minh = minh
+        self.nummern = nummern
+        self.neu = neu
+
+    @classmethod
+    def aus_oberflaeche(cls, punkte, oben, minh, rand=None):
+        """Ergänzt eine triangulierte Oberfläche zum geschlossenen Körper.
+
+        punkte sind die Punkte der Oberfläche, oben deren Dreiecke (von
+        oben gesehen gegen den Uhrzeigersinn). rand sind die Randkanten
+        in derselben Richtung; ohne Angabe werden sie aus den Dreiecken
+        bestimmt. Die Oberfläche muss ein Rechteck überdecken."""
+        if rand is None:
+            rand = randkanten(oben)
+        # Jeder Randpunkt bekommt einen Partner auf Höhe minh.
+        randpunkte, partner = np.unique(rand, return_inverse=True)
+        partner = partner.reshape(rand.shape) + len(punkte)
+        unten = punkte[randpunkte]
+        unten[:, 2] = minh
+        # Die Unterseite ist ein Fächer um die Mitte des Rechtecks, damit
+        # sie genau die Kanten der Seitenwände trifft und trotzdem nur
+        # zwei Dreiecke pro Randabschnitt braucht.
+        mitte = [(punkte[:, 0].min() + punkte[:, 0].max()) / 2,
+                 (punkte[:, 1].min() + punkte[:, 1].max()) / 2, minh]
+        punkte = np.concatenate([punkte, unten, [mitte]])
+        z = len(punkte) - 1
+
+        a, b = rand[:, 0], rand[:, 1]
+        au, bu = partner[:, 0], partner[:, 1]
+        seiten = np.stack([np.stack([b, a, au], axis=-1),
+                           np.stack([b, au, bu], axis=-1)],
+                          axis=1).reshape(-1, 3)
+        boden = np.stack([bu, au, np.full_like(au, z)], axis=-1)
+
+        dreiecke = np.concatenate([oben, seiten, boden]).astype(oben.dtype)
+        n1 = len(oben)
+        n2 = n1 + len(seiten)
+        teile = {"oben": slice(0, n1),
+                 "seiten": slice(n1, n2),
+                 "unten": slice(n2, len(dreiecke))}
+        return cls(punkte, dreiecke, teile, minh)
+
+    @classmethod
+    def aus_raster(cls, raster, minh, max_fehler=None):
+        """Netz mit zwei Dreiecken pro Rasterzelle.
+
+        Mit max_fehler (in Metern) wird die Oberfläche stattdessen
+        adaptiv trianguliert (siehe rtin_dreiecke): große Dreiecke in
+        flachen Bereichen, kleine nur dort, wo das Gelände es verlangt."""
+        if max_fehler is not None:
+            return cls.aus_rtin(raster, minh, max_fehler)
+        punkte, nr, oben = _gitter(raster.h, raster.kl)
+
+        # Rand gegen den Uhrzeigersinn: vorn, rechts, hinten, links
+        rand = np.concatenate([
+            np.stack([nr[:-1, 0], nr[1:, 0]], axis=-1),
+            np.stack([nr[-1, :-1], nr[-1, 1:]], axis=-1),
+            np.stack([nr[1:, -1], nr[:-1, -1]], axis=-1)[::-1],
+            np.stack([nr[0, 1:], nr[0, :-1]], axis=-1)[::-1]])
+        return cls.aus_oberflaeche(punkte, oben, minh, rand)
+
+    @classmethod
+    def aus_rtin(cls, raster, minh, max_fehler):
+        "Adaptives Netz, das höchstens max_fehler vom Raster abweicht"
+        dreiecke = rtin_dreiecke(raster.h, max_fehler)
+        # Nur die benutzten Rasterpunkte werden zu Punkten des Netzes.
+        nummern, oben = np.unique(
+            dreiecke[..., 0] * raster.ny + dreiecke[..., 1],
+            return_inverse=True)
+        typ = np.int32 if 2*len(nummern) < 2**31 else np.int64
+        i, j = np.divmod(nummern, raster.ny)
+        punkte = np.stack([i * raster.kl, j * raster.kl,
+                           raster.h[i, j]], axis=-1).astype(np.float64)
+        return cls.aus_oberflaeche(punkte,
+                                   oben.reshape(-1, 3).astype(typ), minh)
+
+    def __len__(self):
+        return len(self.dreiecke)
+
+    def maxh(self):
+        return float(self.punkte[:, 2].max())
+
+    def ausdehnung(self):
+        "Größte x- und y-Koordinate"
+        return (float(self.punkte[:, 0].max()),
+                float(self.punkte[:, 1].max()))
+
+    def punktzahl(self):
+        return len(self.punkte)
+
+    def grenzen(self):
+        "Kleinste und größte Koordinaten (je x, y, z)"
+        return self.punkte.min(axis=0), self.punkte.max(axis=0)
+
+    def teilnetze(self):
+        "Das Netz in Teilen, die nacheinander ausgegeben werden (hier eins)"
+        yield self
+
+    def neue_punkte(self):
+        "Die Punkte, die in keinem früheren Teilnetz vorkommen"
+        return self.punkte[self.neu:]
+
+    def nummerierte_dreiecke(self, von=0, bis=None):
+        "Dreiecke von … bis mit den Punktnummern des ganzen Netzes"
+        dreiecke = self.dreiecke[von:bis].astype(np.int64)
+        if self.nummern is None:
+            return dreiecke
+        return self.nummern[dreiecke]
+
+    def bloecke(self, groesse):
+        "Teilt die Dreiecke in Abschnitte (von, bis) auf"
+        for von in range(0, len(self.dreiecke), groesse):
+            yield von, min(von+groesse, len(self.dreiecke))
+
+    def ecken(self, von=0, bis=None):
+        "Koordinaten der Eckpunkte (k×3×3) der Dreiecke von … bis"
+        return self.punkte[self.dreiecke[von:bis]]
+
+    def normalen(self, von=0, bis=None):
+        "Einheitsnormalen der Dreiecke von … bis (entartete: 0, 0, 0)"
+        e = self.ecken(von, bis)
+        n = np.cross(e[:, 1] - e[:, 0], e[:, 2] - e[:, 0])
+        laenge = np.linalg.norm(n, axis=1, keepdims=True)
+        np.divide(n, laenge, out=n, where=laenge > 0)
+        # -0.0 vermeiden
+        return n + 0.0
+
+
+def _gitter(h, kl, i0=0):
+    """Punkte und Dreiecke der Oberfläche eines Rasterausschnitts.
+
+    h sind die Höhen der Rasterzeilen i0, i0+1, … Liefert die Punkte,
+    ihre Nummern als Array wie h und zwei Dreiecke pro Zelle."""
+    nx, ny = h.shape
+    typ = np.int32 if 2*nx*ny < 2**31 else np.int64
+
+    punkte = np.empty((nx, ny, 3))
+    punkte[..., 0] = (np.arange(i0, i0+nx) * kl)[:, None]
+    punkte[..., 1] = (np.arange(ny) * kl)[None, :]
+    punkte[..., 2] = h
+    punkte = punkte.reshape(-1, 3)
+
+    # Ecken der Zellen: a unten links, b unten rechts,
+    # c oben rechts, d oben links (von oben gesehen)
+    nr = np.arange(nx*ny, dtype=typ).reshape(nx, ny)
+    a, b = nr[:-1, :-1], nr[1:, :-1]
+    c, d = nr[1:, 1:], nr[:-1, 1:]
+    oben = np.stack([np.stack([a, b, c], axis=-1),
+                     np.stack([a, c, d], axis=-1)],
+                    axis=2).reshape(-1, 3)
+    return punkte, nr, oben
+
+
+def randkanten(dreiecke):
+    "Kanten, die nur zu einem Dreieck gehören, in dessen Umlaufrichtung"
+    kanten = dreiecke[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    schluessel = (np.minimum(kanten[:, 0], kanten[:, 1]).astype(np.int64)
+                  * (int(dreiecke.max()) + 1)
+                  + np.maximum(kanten[:, 0], kanten[:, 1]))
+    _, erste, anzahl = np.unique(schluessel, return_index=True,
+                                 return_counts=True)
+    return kanten[np.sort(erste[anzahl == 1])]
+
+
+class Streifennetz:
+    """Das Netz eines Streifenrasters, Streifen für Streifen.
+
+    Ergibt dieselben Dreiecke in derselben Reihenfolge wie
+    Dreiecksnetz.aus_raster(), liegt aber nie ganz im Speicher:
+    teilnetze() liefert zuerst die Oberfläche jedes Streifens und zum
+    Schluss Seitenwände und Boden. Dafür werden nur die Randpunkte
+    gesammelt. Auch die Punktnummern (siehe nummerierte_dreiecke()) sind
+    dieselben wie in aus_raster(): die Rasterpunkte zeilenweise, die
+    gemeinsame Zeile zweier Streifen nur einmal, danach die Punkte des
+    Bodens."""
+
+    def __init__(self, raster, minh):
+        self.raster = raster
+        self.minh = minh
+
+    def __len__(self):
+        nx, ny = self.raster.nx, self.raster.ny
+        # Oberfläche, dazu pro Randkante zwei Wanddreiecke und eines
+        # im Boden
+        return 2*(nx-1)*(ny-1) + 3*2*((nx-1) + (ny-1))
+
+    def maxh(self):
+        return self.raster.maxh()
+
+    def ausdehnung(self):
+        "Größte x- und y-Koordinate"
+        return (float((self.raster.nx-1) * self.raster.kl),
+                float((self.raster.ny-1) * self.raster.kl))
+
+    def punktzahl(self):
+        "Anzahl der Punkte im ganzen Netz"
+        nx, ny = self.raster.nx, self.raster.ny
+        # Die Rasterpunkte, dazu für jeden Randpunkt ein Partner unten
+        # und die Bodenmitte
+        return nx*ny + nx*ny - max(nx-2, 0)*max(ny-2, 0) + 1
+
+    def grenzen(self):
+        "Kleinste und größte Koordinaten (je x, y, z)"
+        breite, tiefe = self.ausdehnung()
+        return (np.array([0.0, 0.0, self.minh]),
+                np.array([breite, tiefe, self.maxh()]))
+
+    def teilnetze(self):
+        "Oberflächen der Streifen, danach Seitenwände und Boden"
+        kl, nx, ny = self.raster.kl, self.raster.nx, self.raster.ny
+        randnummern, randpunkte = [], []
+        for i0, h in self.raster.streifen():
+            punkte, nr, oben = _gitter(h, kl, i0)
+            # Die erste Zeile hatte schon der vorige Streifen.
+            neu = 0 if i0 == 0 else 1
+            yield Dreiecksnetz(punkte, oben, {"oben": slice(0, len(oben))},
+                               self.minh, i0*ny + np.arange(len(punkte)),
+                               neu*ny)
+            rand = np.zeros(nr.shape, bool)
+            rand[:, [0, -1]] = True
+            if i0 == 0:
+                rand[0] = True
+            if i0 + len(h) == nx:
+                rand[-1] = True
+            rand[:neu] = False
+            randnummern.append(i0*ny + nr[rand])
+            randpunkte.append(punkte[nr[rand]])
+        yield self._rand(np.concatenate(randnummern),
+                         np.concatenate(randpunkte))
+
+    def _rand(self, nummern, punkte):
+        """Seitenwände und Boden aus den Randpunkten.
+
+        nummern sind die aufsteigenden Nummern der Randpunkte im ganzen
+        Netz. Die Randkanten laufen wie in aus_raster() gegen den
+        Uhrzeigersinn: vorn, rechts, hinten, links."""
+        nx, ny = self.raster.nx, self.raster.ny
+        i = np.arange(nx) * ny
+        j = np.arange(ny)
+        rand = np.concatenate([
+            np.stack([i[:-1], i[1:]], axis=-1),
+            np.stack([i[-1] + j[:-1], i[-1] + j[1:]], axis=-1),
+            np.stack([i[1:] + ny-1, i[:-1] + ny-1], axis=-1)[::-1],
+            np.stack([j[1:], j[:-1]], axis=-1)[::-1]])
+        netz = Dreiecksnetz.aus_oberflaeche(
+            punkte, np.empty((0, 3), np.int64), self.minh,
+            np.searchsorted(nummern, rand))
+        # Die Partner unten und die Mitte kommen nach allen Rasterpunkten.
+        netz.nummern = np.concatenate(
+            [nummern, nx*ny + np.arange(len(nummern)+1)])
+        netz.neu = len(nummern)
+        return netz
+
+
+### Adaptive Triangulation (RTIN) ###
+#
+# Right-Triangulated Irregular Network, wie bei Evans, Kirkpatrick und
+# Townsend (2001) bzw. in Mapbox' „Martini“: Ein quadratisches Raster
+# mit 2**k+1 Punkten pro Seite wird in zwei rechtwinklige Dreiecke
+# geteilt, jedes Dreieck wird an der Hypotenuse weiter halbiert, bis die
+# Katheten einen Rasterabstand lang sind. Ein Dreieck wird nur dann
+# geteilt, wenn es zu stark vom Raster abweicht. Weil der Fehler eines
+# Dreiecks mindestens so groß ist wie der seiner Teildreiecke und die
+# beiden Dreiecke an einer gemeinsamen Hypotenuse denselben Wert
+# bekommen, entstehen keine Risse (T-Kreuzungen) im Netz.
+#
+# Der Fehler wird hier nicht nur am Halbierungspunkt gemessen, sondern
+# als größte senkrechte Abweichung aller Rasterpunkte im Dreieck von der
+# Dreiecksebene. Das fertige Netz hält max_fehler damit garantiert ein.
+#
+# Rasterpunkte werden mit (i, j) wie im Hoehenraster bezeichnet. Das
+# Quadrat ist meist größer als das Raster; Dreiecke außerhalb werden
+# weggelassen, solche auf der Grenze immer weiter geteilt.
+
+# So viele Punkte werden bei der Fehlerberechnung höchstens auf einmal
+# ausgewertet.
+PUNKTE_PRO_BLOCK = 1 << 22
+
+
+def _ebene(tiefe, seite, von, bis):
+    """Eckpunkte a, b, c (je k×2) der Dreiecke von … bis in der Ebene tiefe.
+
+    a-b ist die Hypotenuse, c der rechte Winkel; von oben gesehen liegen
+    a, b, c im Uhrzeigersinn. Die Nummerierung folgt Martini: Das
+    niedrigste Bit wählt eines der beiden Startdreiecke, jedes weitere
+    die linke oder rechte Hälfte."""
+    ids = np.arange(von, bis, dtype=np.int64) + 2**(tiefe+1)
+    erstes = (ids & 1).astype(bool)[:, None]
+    a = np.where(erstes, [0, 0], [seite, seite])
+    b = np.where(erstes, [seite, seite], [0, 0])
+    c = np.where(erstes, [seite, 0], [0, seite])
+    for _ in range(tiefe):
+        ids >>= 1
+        m = (a + b) >> 1
+        links = (ids & 1).astype(bool)[:, None]
+        a, b, c = np.where(links, c, b), np.where(links, a, c), m
+    return a, b, c
+
+
+def _lage(a, b, c, nx, ny):
+    "Ob die Dreiecke ganz im Raster bzw. ganz außerhalb liegen"
+    x = np.stack([a[:, 0], b[:, 0], c[:, 0]])
+    y = np.stack([a[:, 1], b[:, 1], c[:, 1]])
+    innen = (x.max(axis=0) <= nx-1) & (y.max(axis=0) <= ny-1)
+    aussen = (x.min(axis=0) >= nx-1) | (y.min(axis=0) >= ny-1)
+    return innen, aussen
+
+
+def _abweichung(h, a, b, c):
+    "Größte Abweichung der Rasterpunkte in den Dreiecken von deren Ebene"
+    fehler = np.zeros(len(a))
+    # Alle Dreiecke derselben Form decken relativ zu a dieselben
+    # Rasterpunkte ab, mit denselben baryzentrischen Koordinaten. In einer
+    # Ebene hängt die Form nur von der Richtung der Hypotenuse a-b ab.
+    u = b - a
+    richtung = np.sign(u[:, 0]) * 3 + np.sign(u[:, 1])
+    for r in np.unique(richtung).tolist():
+        welche = np.nonzero(richtung == r)[0]
+        ux, uy = u[welche[0]].tolist()
+        vx, vy = (c[welche[0]] - a[welche[0]]).tolist()
+        dx, dy = np.meshgrid(
+            np.arange(min(0, ux, vx), max(0, ux, vx) + 1),
+            np.arange(min(0, uy, vy), max(0, uy, vy) + 1), indexing="ij")
+        det = ux*vy - uy*vx
+        lb = (dx*vy - dy*vx) * np.sign(det)
+        lc = (ux*dy - uy*dx) * np.sign(det)
+        drin = (lb >= 0) & (lc >= 0) & (lb + lc <= abs(det))
+        dx, dy = dx[drin], dy[drin]
+        lb, lc = lb[drin] / abs(det), lc[drin] / abs(det)
+
+        schritt = max(1, PUNKTE_PRO_BLOCK // len(dx))
+        for von in range(0, len(welche), schritt):
+            w = welche[von:von+schritt]
+            ha = h[a[w, 0], a[w, 1]][:, None]
+            hb = h[b[w, 0], b[w, 1]][:, None]
+            hc = h[c[w, 0], c[w, 1]][:, None]
+            ebene = ha + lb * (hb - ha) + lc * (hc - ha)
+            punkte = h[a[w, 0][:, None] + dx, a[w, 1][:, None] + dy]
+            fehler[w] = np.abs(punkte - ebene).max(axis=1)
+    return fehler
+
+
+def rtin_fehler(h):
+    """Fehler aller RTIN-Dreiecke über dem Raster h.
+
+    Liefert ein quadratisches Array, in dem am Halbierungspunkt jeder
+    Hypotenuse der Fehler der beiden angrenzenden Dreiecke und all ihrer
+    Teildreiecke steht."""
+    nx, ny = h.shape
+    k = max(1, int(np.ceil(np.log2(max(nx, ny) - 1))))
+    seite = 2**k
+    fehler = np.zeros((seite+1, seite+1))
+    schritt = PUNKTE_PRO_BLOCK // 16
+    # Von den kleinsten Dreiecken (Katheten √2) zu den beiden größten;
+    # die Dreiecke mit Katheten 1 werden nie geteilt.
+    for tiefe in range(2*k-1, -1, -1):
+        for von in range(0, 2**(tiefe+1), schritt):
+            a, b, c = _ebene(tiefe, seite, von,
+                             min(von+schritt, 2**(tiefe+1)))
+            innen, aussen = _lage(a, b, c, nx, ny)
+            a, b, c, innen = a[~aussen], b[~aussen], c[~aussen], innen[~aussen]
+            # Dreiecke auf der Rastergrenze müssen geteilt werden.
+            f = np.full(len(a), np.inf)
+            f[innen] = _abweichung(h, a[innen], b[innen], c[innen])
+            if tiefe < 2*k-1:
+                # Halbierungspunkte der beiden Teildreiecke
+                l = (a + c) >> 1
+                r = (b + c) >> 1
+                f = np.maximum(f, np.maximum(fehler[l[:, 0], l[:, 1]],
+                                             fehler[r[:, 0], r[:, 1]]))
+            m = (a + b) >> 1
+            np.maximum.at(fehler, (m[:, 0], m[:, 1]), f)
+    return fehler
+
+
+def rtin_dreiecke(h, max_fehler, fehler=None):
+    """Adaptive Triangulation des Rasters h mit höchstens max_fehler.
+
+    Liefert die Dreiecke als Array (m×3×2) von Rasterindizes (i, j),
+    von oben gesehen gegen den Uhrzeigersinn. fehler kann ein schon
+    berechnetes Ergebnis von rtin_fehler(h) sein."""
+    if fehler is None:
+        fehler = rtin_fehler(h)
+    nx, ny = h.shape
+    seite = len(fehler) - 1
+    a, b, c = _ebene(0, seite, 0, 2)
+    fertig = []
+    while len(a):
+        innen, aussen = _lage(a, b, c, nx, ny)
+        a, b, c = a[~aussen], b[~aussen], c[~aussen]
+        m = (a + b) >> 1
+        if abs(a - c).sum(axis=1).max(initial=0) == 1:
+            # Kleinste Dreiecke
+            teilen = np.zeros(len(a), bool)
+        else:
+            teilen = fehler[m[:, 0], m[:, 1]] > max_fehler
+        fertig.append(np.stack([a, c, b], axis=1)[~teilen])
+        a, b, c, m = a[teilen], b[teilen], c[teilen], m[teilen]
+        a, b, c = (np.concatenate([c, b]), np.concatenate([a, c]),
+                   np.concatenate([m, m]))
+    return np.concatenate(fertig)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+# Einstellungen für Cache, Zeilenindex und Prozesse.
+
+# Gelaendemodell.py, die Exportaufträge der Oberfläche (Exportauftraege.py)
+# und die Karte in OSMProject.py lesen sie von hier, Änderungen gelten
+# also überall.
+
+from Kacheln import Kachelcache
+
+# Binärkopien der gelesenen XYZ-Kacheln (siehe Kacheln.py) machen jeden
+# weiteren Lauf mit denselben Kacheln deutlich schneller.
+# CACHE_ORDNER = None legt die Kopien neben den XYZ-Dateien ab,
+# CACHE_GROESSE begrenzt den Platz pro Ordner (None: unbegrenzt),
+# CACHE = False schaltet den Cache ab.
+CACHE = True
+CACHE_ORDNER = None
+CACHE_GROESSE = 4 * 1024**3
+
+# Für Punktabstände kl, die durch 2, 4, 8 … teilbar sind, kann der Cache
+# verkleinerte Stufen der Kacheln anlegen (siehe Kacheln.py).
+# Erkundungsläufe mit großem kl sind damit sehr schnell; die Höhen sind
+# dann aber geglättet, Mittelwerte der Blöcke statt einzelner Messpunkte.
+# Deshalb nur mit PYRAMIDE = True oder --pyramide, sonst gilt immer die
+# volle Auflösung.
+PYRAMIDE = False
+
+# Ohne Cache werden über einen Zeilenindex pro Kachel (<Kachel>.idx.npz)
+# nur die Abschnitte der XYZ-Dateien gelesen, die im Rechteck liegen.
+INDEX = True
+
+# Anzahl der Prozesse zum Lesen der Kacheln (None: alle Prozessorkerne,
+# 1: nacheinander im Hauptprozess).
+PROZESSE = None
+
+# Anzahl der Prozesse zum Schreiben der Ausgabedateien (None: alle
+# Prozessorkerne, höchstens eine pro Datei; 1: nacheinander).
+EXPORTPROZESSE = None
+
+# Anzahl der Prozesse für die Modelle einer Auftragsdatei (--stapel);
+# jedes Modell wird dann in einem Prozess komplett erzeugt.
+STAPELPROZESSE = None
+
+
+def neuer_cache(pyramide=PYRAMIDE):
+    "Kachelcache nach den Einstellungen oben (None ohne Cache)"
+    if CACHE:
+        return Kachelcache(CACHE_ORDNER, CACHE_GROESSE, pyramide=pyramide)
+    return None
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+# Abbrechbare Exportaufträge für eine Oberfläche.
+
+# Jeder Auftrag erzeugt ein Modell mit den Schritten aus Modellbau.py und
+# den Cache-Einstellungen aus Einstellungen.py in einem eigenen Prozess.
+# Die Oberfläche bleibt dabei bedienbar, mehrere Aufträge laufen
+# gleichzeitig, und ein Auftrag lässt sich jederzeit abbrechen, auch
+# mitten im Laden der Kacheln oder im Schreiben einer Datei: Der Prozess
+# wird einfach beendet. Er räumt dabei noch seine temporären Dateien im
+# Kachelcache weg (SIGTERM wird zu SystemExit; unter Windows beendet
+# terminate() sofort). Sobald er weg ist, werden die angefangenen
+# Ausgabedateien des Auftrags gelöscht, halbe Dateien bleiben also nicht
+# liegen. Gewartet wird darauf nicht, das erledigt der nächste Aufruf von
+# abfragen(). Zwei laufende Aufträge mit demselben Namen würden in
+# dieselben Dateien schreiben und werden deshalb abgelehnt.
+
+# Der Fortschritt kommt pro Arbeitsschritt über eine eigene Pipe je
+# Auftrag (eine gemeinsame Queue könnte beim Beenden eines Prozesses
+# beschädigt werden). Die Oberfläche ruft regelmäßig abfragen() auf, etwa
+# mit after() aus der Tk-Hauptschleife.
+
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from Kachelbestand import Kachelbestand, Katalog, KATALOG
+from Koordinaten import utm, geo
+from Exporte import FORMATE
+from Modellbau import (FehlendeDaten, protokoll, rechteck, kacheln, lade,
+                       hoehenbereich, baue_netz, exportiere_modell)
+from Einstellungen import neuer_cache, INDEX
+
+# Zustände eines Auftrags
+LAEUFT = "läuft"
+FERTIG = "fertig"
+FEHLER = "Fehler"
+ABGEBROCHEN = "abgebrochen"
+
+# Anteil am Fortschritt, mit dem die Schritte beginnen
+ANTEILE = {"rechteck": 0.0, "kacheln": 0.05, "lade": 0.1,
+           "hoehenbereich": 0.6, "netz": 0.65, "export": 0.75}
+
+# So lange [s] darf ein abgebrochener Auftrag noch aufräumen, danach
+# wird er hart beendet.
+ABBRUCHFRIST = 5
+
+
+def ecken_um(breite, laenge, radius):
+    """Eckpunkte des Quadrats mit halber Seitenlänge radius [m] um einen
+    Mittelpunkt (Dezimalgrad), wie sie erzeuge_modell() erwartet"""
+    n, e, zone = utm(breite, laenge)
+    b1, l1 = geo(n-radius, e-radius, zone)
+    b2, l2 = geo(n+radius, e+radius, zone)
+    return (float(b1), float(l1)), (float(b2), float(l2))
+
+
+def ausgabedateien(name, formate):
+    "Namen der Ausgabedateien eines Auftrags"
+    return [name+f.endung for f in formate]
+
+
+def _beendet(signalnummer, rahmen):
+    sys.exit(1)
+
+
+def _arbeite(verbindung, name, ecken, ordner, kl, kh, formate):
+    "Erzeugt das Modell im Auftragsprozess und meldet jeden Schritt"
+    # Mit SystemExit laufen beim Abbrechen die finally-Blöcke, die
+    # temporäre Dateien löschen.
+    signal.signal(signal.SIGTERM, _beendet)
+    log = protokoll(name, bildschirm=False)
+
+    def schritt(anteil, text):
+        log(text, sichtbar=False)
+        verbindung.send((LAEUFT, anteil, text))
+
+    try:
+        log("Basisname: "+name, sichtbar=False)
+        schritt(ANTEILE["rechteck"], "Rechteck bestimmen")
+        (lat1, lon1), (lat2, lon2) = ecken
+        r = rechteck(lat1, lon1, lat2, lon2, log=log)
+        schritt(ANTEILE["kacheln"], "Kacheln suchen")
+        pfade = kacheln(Kachelbestand(ordner, Katalog(KATALOG)), r)
+        schritt(ANTEILE["lade"], "Lade %i Kacheln" % len(pfade))
+        # Derselbe Cache wie auf der Kommandozeile: begrenzt, und die
+        # Pyramide nur mit PYRAMIDE = True
+        raster = lade(pfade, r, kl, kh, cache=neuer_cache(), index=INDEX,
+                      log=log)
+        schritt(ANTEILE["hoehenbereich"], "Höhenbereich")
+        minh, maxh, minhs = hoehenbereich(raster, log=log)
+        schritt(ANTEILE["netz"], "Dreiecksnetz")
+        netz = baue_netz(raster, minh, formate, log=log)
+
+        # Jede Datei wird vor dem Schreiben gemeldet, das ergibt den
+        # Fortschritt im letzten Schritt.
+        meldungen = {f.meldung % (name+f.endung): i
+                     for i, f in enumerate(formate)}
+        anteil = 1 - ANTEILE["export"]
+
+        def exportlog(s, sichtbar=True):
+            log(s, sichtbar)
+            if s in meldungen:
+                verbindung.send((LAEUFT, ANTEILE["export"] + anteil *
+                                 meldungen[s] / len(formate), s))
+
+        exportiere_modell(name, formate, raster, netz, minh, maxh,
+                          log=exportlog)
+        log("Programmlauf erfolgreich beendet.\n\n")
+        verbindung.send((FERTIG, 1.0, "Fertig"))
+    except FehlendeDaten as fehler:
+        log(str(fehler))
+        verbindung.send((FEHLER, 0.0, str(fehler)))
+    except Exception as fehler:
+        log("Fehler: %r" % fehler)
+        verbindung.send((FEHLER, 0.0, "Fehler: %s" % fehler))
+    finally:
+        verbindung.close()
+
+
+class Exportauftrag:
+    "Ein laufender oder beendeter Auftrag"
+
+    def __init__(self, nummer, name, formate, prozess, verbindung):
+        self.nummer = nummer
+        self.name = name
+        self.formate = formate
+        self.prozess = prozess
+        self.verbindung = verbindung
+        self.zustand = LAEUFT
+        self.anteil = 0.0
+        self.text = "Start"
+        # Zeitpunkt, ab dem ein abgebrochener Prozess hart beendet wird
+        self.frist = None
+
+    def __repr__(self):
+        return "%s (%s, %i %%, %s)" % (self.name, self.zustand,
+                                       100*self.anteil, self.text)
+
+
+class Auftragsverwaltung:
+    """Startet Exportaufträge in eigenen Prozessen und verfolgt sie.
+
+    kontext ist die Startmethode für multiprocessing (None: Standard)."""
+
+    def __init__(self, kontext=None):
+        self.kontext = multiprocessing.get_context(kontext)
+        self.auftraege = {}
+        self.naechste = 1
+        # Beendete Aufträge, deren Prozess noch nicht weg ist
+        self.beendend = []
+
+    def starte(self, name, ecken, ordner, kl=1, kh=1, formate=None):
+        """Startet einen Auftrag und liefert ihn zurück
+
+        Läuft noch ein Auftrag mit demselben Namen, gibt es ValueError."""
+        if any(a.name == name for a in self.laufend() + self.beendend):
+            raise ValueError("Auftrag %s läuft schon" % name)
+        if formate is None:
+            formate = list(FORMATE.values())
+        empfang, sender = self.kontext.Pipe(duplex=False)
+        prozess = self.kontext.Process(
+            target=_arbeite, args=(sender, name, ecken, ordner, kl, kh,
+                                   formate), daemon=True)
+        prozess.start()
+        # Das Sendeende gehört jetzt dem Auftragsprozess.
+        sender.close()
+        auftrag = Exportauftrag(self.naechste, name, formate, prozess,
+                                empfang)
+        self.auftraege[auftrag.nummer] = auftrag
+        self.naechste += 1
+        return auftrag
+
+    def laufend(self):
+        return [a for a in self.auftraege.values() if a.zustand == LAEUFT]
+
+    def offen(self):
+        "Ob noch Aufträge laufen oder aufräumen, also abfragen() nötig ist"
+        return bool(self.laufend() or self.beendend)
+
+    def abfragen(self):
+        """Holt alle Meldungen der Aufträge ab, ohne zu warten.
+
+        Liefert die Aufträge, die sich seit dem letzten Aufruf geändert
+        haben."""
+        geaendert = []
+        for auftrag in self.laufend():
+            try:
+                while auftrag.verbindung.poll():
+                    auftrag.zustand, auftrag.anteil, auftrag.text = \
+                        auftrag.verbindung.recv()
+                    if auftrag not in geaendert:
+                        geaendert.append(auftrag)
+            except (EOFError, OSError):
+                # Prozess ohne Abschlussmeldung beendet
+                if auftrag.zustand == LAEUFT:
+                    auftrag.zustand = FEHLER
+                    auftrag.text = "Prozess unerwartet beendet (%s)" % (
+                        auftrag.prozess.exitcode)
+                    geaendert.append(auftrag)
+            if auftrag.zustand != LAEUFT:
+                self.beendend.append(auftrag)
+        self._raeume_auf()
+        return geaendert
+
+    def abbrechen(self, nummer):
+        """Bricht einen Auftrag ab
+
+        Seine angefangenen Dateien werden gelöscht, sobald der Prozess
+        beendet ist."""
+        auftrag = self.auftraege[nummer]
+        if auftrag.zustand != LAEUFT:
+            return
+        auftrag.prozess.terminate()
+        auftrag.frist = time.monotonic() + ABBRUCHFRIST
+        auftrag.zustand = ABGEBROCHEN
+        auftrag.text = "Abgebrochen"
+        self.beendend.append(auftrag)
+
+    def _raeume_auf(self):
+        "Schließt die Aufträge ab, deren Prozess inzwischen beendet ist"
+        for auftrag in list(self.beendend):
+            if auftrag.prozess.is_alive():
+                if auftrag.frist is not None and \
+                        time.monotonic() > auftrag.frist:
+                    auftrag.prozess.kill()
+                continue
+            auftrag.prozess.join()
+            auftrag.verbindung.close()
+            if auftrag.zustand == ABGEBROCHEN:
+                for datei in ausgabedateien(auftrag.name, auftrag.formate):
+                    try:
+                        os.remove(datei)
+                    except OSError:
+                        pass
+            self.beendend.remove(auftrag)
+
+    def schliesse(self):
+        "Bricht alle laufenden Aufträge ab und wartet höchstens ABBRUCHFRIST"
+        for auftrag in self.laufend():
+            self.abbrechen(auftrag.nummer)
+        for auftrag in self.beendend:
+            auftrag.prozess.join(max(0, auftrag.frist - time.monotonic())
+                                 if auftrag.frist is not None else None)
+            if auftrag.prozess.is_alive():
+                auftrag.prozess.kill()
+                auftrag.prozess.join()
+        self._raeume_auf()
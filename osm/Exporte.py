@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+
+# Ausgabe der Höhenmodelle in die verschiedenen Dateiformate.
+
+# DXF, CAD-Skript mit 3D-Flächen und STL geben nur das gemeinsame
+# Dreiecksnetz aus (siehe Dreiecksnetz.py). Die Prismenfelder werden
+# direkt aus dem Hoehenraster erzeugt.
+
+# Alle Schreibfunktionen gehen Raster und Netz nur der Reihe nach durch
+# (raster.zeilen(), netz.teilnetze()). Deshalb können sie statt eines
+# Hoehenrasters auch ein Streifenraster (siehe Kacheln.py) und statt des
+# Dreiecksnetzes dessen Streifennetz bekommen und große Gebiete mit
+# begrenztem Speicher schreiben.
+
+import json
+import multiprocessing
+import os
+import struct
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain, repeat
+
+import numpy as np
+
+from Gemeinsam import GemeinsamerSpeicher
+from Kompression import oeffne, endung
+
+# So viele Dreiecke werden höchstens auf einmal verarbeitet.
+DREIECKE_PRO_BLOCK = 1 << 20
+# Bei Textformaten kleinere Blöcke, weil jedes Dreieck einige
+# hundert Byte Text ergibt
+DREIECKE_PRO_TEXTBLOCK = 1 << 16
+
+
+### Register der Ausgabeformate ###
+#
+# Jede Schreibfunktion wird mit @ausgabeformat unter einem kurzen Namen
+# eingetragen. Sie bekommt den Dateinamen und die unter argumente
+# genannten Daten ("raster", "netz", "minh", "maxh"). Es werden nur die
+# gewünschten Formate geschrieben, und das Dreiecksnetz muss nur
+# aufgebaut werden, wenn eines davon es braucht. Textformate nehmen
+# außerdem "kompression" (siehe Kompression.py); ihr Dateiname bekommt
+# dann die Endung des Verfahrens.
+
+Ausgabeformat = namedtuple("Ausgabeformat",
+                           "name endung meldung funktion argumente")
+
+# Name -> Ausgabeformat, in der Reihenfolge der Einträge
+FORMATE = {}
+
+
+def ausgabeformat(name, endung, meldung, *argumente):
+    "Dekorator, der eine Schreibfunktion ins Register einträgt"
+    def eintragen(funktion):
+        FORMATE[name] = Ausgabeformat(name, endung, meldung, funktion,
+                                      argumente)
+        return funktion
+    return eintragen
+
+
+def waehle_formate(namen=None):
+    """Prüft eine Liste von Formatnamen (None: alle).
+
+    Liefert die Formate in der Reihenfolge des Registers, jedes nur
+    einmal."""
+    if namen is None:
+        return list(FORMATE.values())
+    unbekannt = [n for n in namen if n not in FORMATE]
+    if unbekannt:
+        raise ValueError("Unbekanntes Ausgabeformat: %s (möglich: %s)" % (
+            ", ".join(unbekannt), ", ".join(FORMATE)))
+    return [f for n, f in FORMATE.items() if n in namen]
+
+
+def braucht(formate, daten):
+    "Ob eines der Formate die Daten (z. B. \"netz\") braucht"
+    return any(daten in f.argumente for f in formate)
+
+
+def ausgabeauftraege(name, formate, kompression=None, **daten):
+    """Aufträge für exportiere(): eine Datei name+endung pro Format.
+
+    daten enthält die Werte für die Argumente der Schreibfunktionen.
+    Mit kompression werden die Textformate gepackt geschrieben."""
+    daten["kompression"] = kompression
+    return [(f.meldung, f.funktion, name+f.endung+(
+                endung(kompression) if "kompression" in f.argumente else ""),
+             tuple(daten[a] for a in f.argumente))
+            for f in formate]
+
+
+def _innenname(ausname, kompression):
+    "Dateiname für Namensfelder in der Datei, ohne Endung der Kompression"
+    zusatz = endung(kompression)
+    return ausname[:-len(zusatz)] if zusatz else ausname
+
+
+### Textformate ###
+#
+# Für DXF, SCR und ASCII-STL wird der Text einer ganzen Rasterzeile bzw.
+# eines Blocks von Dreiecken mit einem einzigen %-Ausdruck erzeugt: Die
+# Vorlage für eine Zelle wird entsprechend oft wiederholt und mit allen
+# Werten gefüllt. Jede Zahl wird dabei nur einmal in Text umgewandelt,
+# obwohl sie in mehreren Flächen vorkommt. Die Vorlagen enthalten deshalb
+# nur %s, das eigentliche Format (%i, %s, %.2f, %f) steckt in den Spalten.
+
+# Koordinaten im Dreiecksnetz: ganze Meter ohne Nachkommastellen,
+# Höhen wie gespeichert (höchstens zwei Nachkommastellen)
+ZAHL = "%.10g"
+
+def _s(werte):
+    "Texte wie mit %s bzw. %i (für Gleitkommazahlen bzw. Ganzzahlen)"
+    return list(map(str, werte))
+
+
+def _f2(werte):
+    "Texte wie mit %.2f"
+    return list(map("%.2f".__mod__, werte))
+
+
+def _f(werte):
+    "Texte wie mit %f"
+    return list(map("%f".__mod__, werte))
+
+
+def _fuelle(vorlage, n, *spalten):
+    """Füllt die n-mal wiederholte Vorlage einer Zelle.
+
+    Jede Spalte ist entweder eine Liste mit (mindestens) n fertigen Texten
+    oder ein einzelner Text, der in allen Zellen gleich ist."""
+    if n <= 0:
+        return ""
+    spalten = [repeat(spalte, n) if isinstance(spalte, str) else spalte
+               for spalte in spalten]
+    return (vorlage * n) % tuple(chain.from_iterable(zip(*spalten)))
+
+
+def _texte(werte):
+    "Objekt-Array mit ZAHL-Texten, jeder vorkommende Wert nur einmal formatiert"
+    einzeln, inverse = np.unique(werte, return_inverse=True)
+    return np.array(list(map(ZAHL.__mod__, einzeln.tolist())),
+                    dtype=object)[inverse.reshape(np.shape(werte))]
+
+
+def _fuelle_tabelle(vorlage, tabelle):
+    "Füllt die Vorlage einmal für jede Zeile der Tabelle (Objekt-Array)"
+    return (vorlage * len(tabelle)) % tuple(tabelle.ravel().tolist())
+
+
+def _ecktexte(netz):
+    "Texte der Koordinaten aller Punkte des Netzes (n×3)"
+    return np.stack([_texte(netz.punkte[:, k]) for k in range(3)], axis=-1)
+
+
+class _Raster:
+    "Häufig gebrauchte Texte eines Rasters für die Textformate"
+
+    def __init__(self, raster, minh):
+        self.raster = raster
+        self.kl = kl = raster.kl
+        self.nx, self.ny = raster.nx, raster.ny
+        # x- und y-Werte der Rasterpunkte relativ zur Südwestecke
+        self.xs = _s(range(0, self.nx*kl, kl))
+        self.ys = _s(range(0, self.ny*kl, kl))
+        self.minh = "%.2f" % minh
+
+    def zeilen(self, format=_s):
+        """Durchläuft alle Rasterzellen zeilenweise.
+
+        Liefert für jede Zeile i die Texte xu, xu+kl, die formatierten
+        Höhen der Rasterlinien i und i+1 und diese Höhen selbst. Es
+        werden immer nur zwei Rasterlinien gebraucht, so geht das auch
+        mit einem Streifenraster."""
+        zeilen = self.raster.zeilen()
+        h1 = next(zeilen)
+        z1 = format(h1.tolist())
+        for i, h in enumerate(zeilen):
+            h0, h1 = h1, h
+            z0, z1 = z1, format(h1.tolist())
+            yield self.xs[i], self.xs[i+1], z0, z1, h0, h1
+
+
+def scr_intro(breite, tiefe, minh, maxh):
+    "Nimmt Grundeinstellungen des Zeichnungseditors vor"
+    # Rückgängigmachen ausschalten
+    # Koordinateneingabe hat Vorrang vor Objektfang,
+    # Einheit Meter,
+    # Ansicht schräg von Südwesten,
+    # Visueller Stil Drahtmodell (Geschwindigkeit!),
+    # Zoom auf interessanten Quader
+    return ("Zurück S K\n"
+            "OSnapCoord 1\n"
+            "_InsUnits 6\n"
+            "APunkt -1,-2,2\n"
+            "-Vis A Drahtmodell\n"
+            "Zoom F 0,0,%f %i,%i,%f\n" % (minh, breite, tiefe, maxh))
+
+
+# Einstellungen nach Skriptende:
+def scr_exit():
+    # Rückgängigmachen einschalten
+    # Zoom auf Grenzen
+    return ("Zurück A\n"
+            "Zoom G\n")
+
+
+### XYZ-Datei ###
+
+@ausgabeformat("xyz", ".xyz", "Schreibe XYZ-Ausgabedatei: %s", "raster",
+               "kompression")
+def schreibe_xyz(ausname, raster, kompression=None):
+    "Alle Rasterpunkte mit UTM-Koordinaten als XYZ-Datei"
+    xs = _s(range(raster.ul_e, raster.xmax+1, raster.kl))
+    ys = _s(range(raster.ul_n, raster.ymax+1, raster.kl))
+    with oeffne(ausname, "w", kompression) as aus:
+        for x, zeile in zip(xs, raster.zeilen()):
+            aus.write(_fuelle("%s %s %s\n", len(ys), x, ys,
+                              _f2(zeile.tolist())))
+
+
+### DXF-Datei ###
+
+# Weil 3D-Solids in einem obskuren „Geheimformat“ gespeichert werden, wird
+# hier nur die umhüllende Fläche erzeugt. Diese muss im CAD-Programm mittels
+# der Befehle REGION und HEFTEN in einen SOLID umgewandelt werden, um einen
+# richtigen Geländekörper zu erhalten.
+
+# Ein 3DFACE hat immer vier Eckpunkte, bei Dreiecken wird der dritte
+# wiederholt.
+DXF_DREIECK = ("0\n3DFACE\n"
+               "10\n%s\n20\n%s\n30\n%s\n"
+               "11\n%s\n21\n%s\n31\n%s\n"
+               "12\n%s\n22\n%s\n32\n%s\n"
+               "13\n%s\n23\n%s\n33\n%s\n")
+
+
+@ausgabeformat("dxf", ".dxf", "Schreibe DXF-Datei mit 3D-Flächen: %s", "netz",
+               "kompression")
+def schreibe_dxf(ausname, netz, kompression=None):
+    "Schreibt das Dreiecksnetz als 3DFACE-Objekte in eine DXF-Datei"
+    breite, tiefe = netz.ausdehnung()
+
+    with oeffne(ausname, "w", kompression) as aus:
+        aus.write("0\nSECTION\n2\nHEADER\n"
+                  "9\n$ACADVER\n1\nAC1006\n"
+                  "9\n$INSBASE\n10\n0.0\n20\n0.0\n30\n0.0\n"
+                  "9\n$INSUNITS\n70\n6\n"
+                  "9\n$EXTMIN\n10\n0.0\n20\n0.0\n"
+                  "9\n$EXTMAX\n10\n%f\n20\n%f\n" % (breite, tiefe) +
+                  "9\n$LIMMIN\n10\n0.0\n20\n0.0\n"
+                  "9\n$LIMMAX\n10\n%f\n20\n%f\n" % (breite, tiefe) +
+                  "0\nENDSEC\n"
+                  "0\nSECTION\n2\nENTITIES\n")
+
+        for teil in netz.teilnetze():
+            texte = _ecktexte(teil)
+            for von, bis in teil.bloecke(DREIECKE_PRO_TEXTBLOCK):
+                ecken = texte[teil.dreiecke[von:bis]]
+                aus.write(_fuelle_tabelle(DXF_DREIECK, np.concatenate(
+                    [ecken, ecken[:, 2:]], axis=1)))
+
+        aus.write("0\nENDSEC\n0\nEOF\n")
+
+
+### Skripte für AutoCAD/BricsCAD ###
+
+# Eigentlich wäre es universeller, anstelle der deutschsprachigen
+# Bezeichner englischsprachige Bezeichner mit vorangestelltem Unterstrich
+# zu verwenden. Dummerweise kommt BricsCAD damit nicht immer zurecht.
+
+@ausgabeformat("quadratprismen", ".quadratprismen.scr",
+               "Schreibe CAD-Skriptdatei mit Quadratprismenfeld: %s ",
+               "raster", "minh", "maxh", "kompression")
+def schreibe_scr_quadratprismen(ausname, raster, minh, maxh,
+                                kompression=None):
+    "CAD-Skript mit einem Quader pro Rasterpunkt"
+    r = _Raster(raster, minh)
+    n = r.ny
+    ys1 = _s(range(r.kl, (n+1)*r.kl, r.kl))
+    with oeffne(ausname, "w", kompression) as aus:
+        aus.write(scr_intro(raster.or_e-raster.ul_e,
+                             raster.or_n-raster.ul_n, minh, maxh))
+        for i, zeile in enumerate(raster.zeilen()):
+            aus.write(_fuelle("Quader %s,%s,%s %s,%s,%s\n", n,
+                              r.xs[i], r.ys, r.minh,
+                              str(i*r.kl + r.kl), ys1,
+                              _f2(zeile.tolist())))
+        aus.write(scr_exit())
+
+
+@ausgabeformat("dreiecksprismen", ".dreiecksprismen.scr",
+               "Schreibe CAD-Skriptdatei mit Dreiecksprismenfeld: %s",
+               "raster", "minh", "maxh", "kompression")
+def schreibe_scr_dreiecksprismen(ausname, raster, minh, maxh,
+                                 kompression=None):
+    "CAD-Skript mit zwei schräg abgeschnittenen Dreiecksprismen pro Zelle"
+    r = _Raster(raster, minh)
+    n = r.ny-1
+    ys, ys1 = r.ys, r.ys[1:]
+    m = r.minh
+    mf = "%f" % minh
+    with oeffne(ausname, "w", kompression) as aus:
+        aus.write(scr_intro(raster.or_e-raster.ul_e,
+                             raster.or_n-raster.ul_n, minh, maxh))
+        for x1, x2, z0, z1, h0, h1 in r.zeilen(_f):
+            # Eckpunkte 1 und 4 auf der Linie i, 2 und 3 auf i+1
+            hmax = np.maximum(np.maximum(h0[:-1], h1[:-1]),
+                              np.maximum(h1[1:], h0[1:]))
+            aus.write(_fuelle(
+                # Dreieck auf Nullebene zeichnen …
+                "3DPoly %s,%s,%s %s,%s,%s %s,%s,%s S\n"
+                # … bis zum höchsten Punkt hochziehen …
+                "_extrude L  %s\n"
+                # … und oben schräg abschneiden.
+                "Kappen L   %s,%s,%s %s,%s,%s %s,%s,%s %s,%s,%s\n"
+                # Und nochmal für das zweite Dreieck:
+                "3DPoly %s,%s,%s %s,%s,%s %s,%s,%s S\n"
+                "_extrude L  %s\n"
+                "Kappen L   %s,%s,%s %s,%s,%s %s,%s,%s %s,%s,%s\n", n,
+                x1, ys, m, x2, ys, m, x2, ys1, m,
+                _f((hmax-minh).tolist()),
+                x1, ys, z0, x2, ys, z1, x2, ys1, z1[1:], x1, ys, mf,
+                x1, ys, m, x1, ys1, m, x2, ys1, m,
+                _f(hmax.tolist()),
+                x1, ys, z0, x1, ys1, z0[1:], x2, ys1, z1[1:], x1, ys, mf))
+        aus.write(scr_exit())
+
+
+# Beim Quadratnetz hat BricsCAD die Einschränkung, dass es maximal
+# 256×256 Knoten haben darf. Daher muss hier ausgedünnt werden.
+
+def mesh_schritt(raster):
+    "Nur jeder n-te Punkt pro Richtung, damit das Netz höchstens 256×256 hat"
+    n = 1
+    klm = raster.kl
+    while ((raster.or_e-raster.ul_e+1)//klm > 256 or
+           (raster.or_n-raster.ul_n+1)//klm > 256):
+        n += 1
+        klm = raster.kl * n
+    return n
+
+
+@ausgabeformat("mesh", ".mesh.scr",
+               "Schreibe CAD-Skriptdatei mit 3D-Netz (Mesh): %s ",
+               "raster", "minh", "maxh", "kompression")
+def schreibe_scr_mesh(ausname, raster, minh, maxh, kompression=None):
+    "CAD-Skript mit 3D-Netzen für Gelände und Seitenflächen"
+    n = mesh_schritt(raster)
+    klm = raster.kl * n
+    # Ausgedünntes Raster mit Punktabstand klm
+    Hm = raster.ausgeduennt(n)
+    nx, ny = Hm.shape
+    xs = _s(range(0, nx*klm, klm))
+    ys = _s(range(0, ny*klm, klm))
+    m = "%f" % minh
+
+    with oeffne(ausname, "w", kompression) as aus:
+        aus.write(scr_intro(raster.or_e-raster.ul_e,
+                            raster.or_n-raster.ul_n, minh, maxh))
+        # Gelände
+        aus.write("3dnetz %i %i\n" % (nx, ny))
+        for x, zeile in zip(xs, Hm):
+            aus.write(_fuelle("%s,%s,%s\n", ny, x, ys, _f(zeile.tolist())))
+        # Seitenflächen: vorn, hinten, links, rechts
+        aus.write("3dnetz %i 2\n" % nx)
+        aus.write(_fuelle("%s,%s,%s\n%s,%s,%s\n", nx,
+                          xs, "0", m, xs, "0", _f(Hm[:, 0].tolist())))
+        aus.write("3dnetz %i 2\n" % nx)
+        aus.write(_fuelle("%s,%s,%s\n%s,%s,%s\n", nx,
+                          xs, ys[-1], m, xs, ys[-1], _f(Hm[:, -1].tolist())))
+        aus.write("3dnetz %i 2\n" % ny)
+        aus.write(_fuelle("%s,%s,%s\n%s,%s,%s\n", ny,
+                          "0", ys, m, "0", ys, _f(Hm[0].tolist())))
+        aus.write("3dnetz %i 2\n" % ny)
+        aus.write(_fuelle("%s,%s,%s\n%s,%s,%s\n", ny,
+                          xs[-1], ys, m, xs[-1], ys, _f(Hm[-1].tolist())))
+        # Boden
+        aus.write("3dfläche\n"
+                  "0,0,%s " % m +
+                  "0,%s,%s " % (ys[-1], m) +
+                  "%s,%s,%s " % (xs[-1], ys[-1], m) +
+                  "%s,0,%s \n" % (xs[-1], m))
+        aus.write(scr_exit())
+
+
+# Das 3D-Netz lässt sich in BricsCAD blöderweise nicht zu einem
+# Solid umformen. Hier wird daher nun dasselbe Dreiecksnetz verwendet,
+# das auch für STL-Dateien zum Einsatz kommt.
+
+@ausgabeformat("3dflaechen", ".3dflächen.scr",
+               "Schreibe CAD-Scriptdatei mit 3D-Flächen: %s", "raster",
+               "netz", "minh", "maxh", "kompression")
+def schreibe_scr_3dflaechen(ausname, raster, netz, minh, maxh,
+                            kompression=None):
+    "CAD-Skript mit einer 3D-Fläche pro Dreieck des Netzes"
+    with oeffne(ausname, "w", kompression) as aus:
+        aus.write(scr_intro(raster.or_e-raster.ul_e,
+                            raster.or_n-raster.ul_n, minh, maxh))
+        for teil in netz.teilnetze():
+            texte = _ecktexte(teil)
+            # Sockelhöhe wie in den anderen Skripten mit %.2f
+            sockel = teil.punkte[:, 2] == np.array(minh, teil.punkte.dtype)
+            texte[sockel, 2] = "%.2f" % minh
+            for von, bis in teil.bloecke(DREIECKE_PRO_TEXTBLOCK):
+                aus.write(_fuelle_tabelle(
+                    "3dfläche\n%s,%s,%s\n%s,%s,%s\n%s,%s,%s\n\n\n",
+                    texte[teil.dreiecke[von:bis]]))
+        aus.write(scr_exit())
+
+
+### ASCII-STL-Datei ###
+
+STL_FACETTE = ("facet normal %s %s %s\n"
+               "outer loop\n"
+               "vertex %s %s %s\n"
+               "vertex %s %s %s\n"
+               "vertex %s %s %s\n"
+               "endloop\n"
+               "endfacet\n")
+
+
+@ausgabeformat("stl-ascii", ".ascii.stl",
+               "Schreibe STL-Datei für 3D-Druck (ASCII): %s", "netz",
+               "kompression")
+def schreibe_stl_ascii(ausname, netz, kompression=None):
+    "Schreibt das Dreiecksnetz als ASCII-STL-Datei"
+    with oeffne(ausname, "w", kompression) as aus:
+        name = _innenname(ausname, kompression)
+        aus.write("solid "+name+"\n")
+        for teil in netz.teilnetze():
+            texte = _ecktexte(teil)
+            for von, bis in teil.bloecke(DREIECKE_PRO_TEXTBLOCK):
+                normalen = np.array(list(map("%g".__mod__, teil.normalen(
+                    von, bis).ravel().tolist())), dtype=object).reshape(-1, 3)
+                aus.write(_fuelle_tabelle(STL_FACETTE, np.concatenate(
+                    [normalen[:, None], texte[teil.dreiecke[von:bis]]],
+                    axis=1)))
+        aus.write("endsolid "+name+"\n")
+
+
+### Binäre STL-Datei ###
+#
+# https://de.wikipedia.org/wiki/STL-Schnittstelle
+#
+# Jedes Dreieck besteht aus 50 Bytes:
+#   Normale          3 Gleitkommawerte (je 4 Byte, little-endian)
+#   Eckpunkte        3 × 3 Gleitkommawerte
+#   Attribut         kurze Ganzzahl (2 Byte), immer 0
+# Davor stehen 80 Bytes ungenutzter Header und die Anzahl der Dreiecke
+# als vorzeichenlose Ganzzahl (4 Byte).
+
+STL_DREIECK = np.dtype([("normale", "<f4", (3,)),
+                        ("ecken", "<f4", (3, 3)),
+                        ("attribut", "<u2")])
+
+
+@ausgabeformat("stl", ".binär.stl",
+               "Schreibe STL-Datei für 3D-Druck (binär): %s", "netz")
+def schreibe_stl_binaer(ausname, netz):
+    "Schreibt das Dreiecksnetz als binäre STL-Datei"
+    with open(ausname, "wb") as aus:
+        # 80 Bytes ungenutzter Header
+        aus.write(b'\0' * 80)
+        aus.write(struct.pack('<I', len(netz)))
+        for teil in netz.teilnetze():
+            for von, bis in teil.bloecke(DREIECKE_PRO_BLOCK):
+                dreiecke = np.zeros(bis-von, STL_DREIECK)
+                dreiecke["normale"] = teil.normalen(von, bis)
+                dreiecke["ecken"] = teil.ecken(von, bis)
+                aus.write(dreiecke.tobytes())
+
+
+### Formate mit Punkttabelle ###
+#
+# STL und DXF speichern jede Ecke in jedem Dreieck einzeln, im
+# regelmäßigen Raster also jede Höhe etwa sechsmal. PLY, OBJ und glTF
+# haben eine gemeinsame Punkttabelle, die Dreiecke enthalten nur deren
+# Nummern. Die Dateien werden dadurch mehrfach kleiner und schneller
+# geladen. Punkte und Dreiecke sind dieselben wie in der STL-Datei.
+#
+# Die Dreiecke eines Streifennetzes kommen in mehreren Teilnetzen. Jeder
+# Punkt wird nur einmal geschrieben, auch die gemeinsamen Zeilen der
+# Streifen und die Randpunkte, die Dreiecke bekommen die Nummern im
+# ganzen Netz. Die Dateien sind dadurch dieselben wie ohne Streifen. Bei
+# PLY und GLB stehen alle Punkte vor allen Dreiecken, das Netz wird dafür
+# zweimal durchlaufen.
+
+
+def _punktbloecke(netz, groesse=DREIECKE_PRO_BLOCK):
+    "Punkte aller Teilnetze in Blöcken, jeden nur einmal"
+    for teil in netz.teilnetze():
+        punkte = teil.neue_punkte()
+        for von in range(0, len(punkte), groesse):
+            yield punkte[von:von+groesse]
+
+
+def _dreiecksbloecke(netz, groesse=DREIECKE_PRO_BLOCK):
+    "Dreiecke aller Teilnetze in Blöcken, mit den Nummern im ganzen Netz"
+    for teil in netz.teilnetze():
+        for von, bis in teil.bloecke(groesse):
+            yield teil.nummerierte_dreiecke(von, bis)
+
+
+# Binäres PLY: http://paulbourke.net/dataformats/ply/
+PLY_DREIECK = np.dtype([("anzahl", "u1"), ("ecken", "<u4", (3,))])
+
+
+@ausgabeformat("ply", ".ply", "Schreibe PLY-Datei (binär): %s", "netz")
+def schreibe_ply(ausname, netz):
+    "Schreibt das Dreiecksnetz als binäre PLY-Datei (little-endian)"
+    with open(ausname, "wb") as aus:
+        aus.write(("ply\n"
+                   "format binary_little_endian 1.0\n"
+                   "comment Koordinaten in Metern ab der SW-Ecke\n"
+                   "element vertex %i\n"
+                   "property float x\n"
+                   "property float y\n"
+                   "property float z\n"
+                   "element face %i\n"
+                   "property list uchar uint vertex_indices\n"
+                   "end_header\n" % (netz.punktzahl(), len(netz))
+                   ).encode())
+        for punkte in _punktbloecke(netz):
+            aus.write(punkte.astype("<f4").tobytes())
+        for dreiecke in _dreiecksbloecke(netz):
+            tabelle = np.empty(len(dreiecke), PLY_DREIECK)
+            tabelle["anzahl"] = 3
+            tabelle["ecken"] = dreiecke
+            aus.write(tabelle.tobytes())
+
+
+# Wavefront OBJ: Nummern zählen ab 1.
+
+@ausgabeformat("obj", ".obj", "Schreibe OBJ-Datei: %s", "netz",
+               "kompression")
+def schreibe_obj(ausname, netz, kompression=None):
+    "Schreibt das Dreiecksnetz als Wavefront-OBJ-Datei"
+    with oeffne(ausname, "w", kompression) as aus:
+        aus.write("# Koordinaten in Metern ab der SW-Ecke\n"
+                  "o %s\n" % os.path.basename(_innenname(ausname,
+                                                       kompression)))
+        for teil in netz.teilnetze():
+            neu = teil.neue_punkte()
+            for von in range(0, len(neu), DREIECKE_PRO_TEXTBLOCK):
+                punkte = neu[von:von+DREIECKE_PRO_TEXTBLOCK]
+                aus.write(_fuelle("v %s %s %s\n", len(punkte),
+                                  *(_texte(punkte[:, k]) for k in range(3))))
+            for von, bis in teil.bloecke(DREIECKE_PRO_TEXTBLOCK):
+                nummern = teil.nummerierte_dreiecke(von, bis) + 1
+                aus.write(_fuelle("f %i %i %i\n", bis-von,
+                                  *nummern.T.tolist()))
+
+
+# glTF 2.0 als eine binäre Datei (GLB):
+#   https://registry.khronos.org/glTF/specs/2.0/glTF-2.0.html
+# Header (12 Byte), JSON-Teil mit der Beschreibung, BIN-Teil mit den
+# Punkten (float32) und Dreiecken (uint32). glTF rechnet in Metern mit
+# der y-Achse nach oben; aus (x, y, z) wird deshalb (x, z, -y). Das ist
+# eine Drehung, der Umlaufsinn der Dreiecke bleibt erhalten.
+
+def _glb_punkte(punkte):
+    return np.stack([punkte[:, 0], punkte[:, 2], -punkte[:, 1]],
+                    axis=-1).astype("<f4")
+
+
+@ausgabeformat("glb", ".glb", "Schreibe glTF-Datei (GLB): %s", "netz")
+def schreibe_glb(ausname, netz):
+    "Schreibt das Dreiecksnetz als binäre glTF-Datei"
+    n, m = netz.punktzahl(), len(netz)
+    kleinste, groesste = netz.grenzen()
+    grenzen = _glb_punkte(np.array([kleinste, groesste]))
+    punktbytes, dreiecksbytes = 12*n, 12*m
+    beschreibung = {
+        "asset": {"version": "2.0", "generator": "Gelaendemodell.py"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "name": os.path.basename(ausname)}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0},
+                                    "indices": 1, "mode": 4}]}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": n,
+             "type": "VEC3",
+             "min": grenzen.min(axis=0).tolist(),
+             "max": grenzen.max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": 5125, "count": 3*m,
+             "type": "SCALAR"}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": punktbytes,
+             "target": 34962},
+            {"buffer": 0, "byteOffset": punktbytes,
+             "byteLength": dreiecksbytes, "target": 34963}],
+        "buffers": [{"byteLength": punktbytes + dreiecksbytes}]}
+    text = json.dumps(beschreibung, separators=(",", ":")).encode()
+    # Beide Teile müssen auf vier Byte aufgefüllt sein, der JSON-Teil
+    # mit Leerzeichen.
+    text += b" " * (-len(text) % 4)
+    with open(ausname, "wb") as aus:
+        aus.write(struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(text) + 8
+                              + punktbytes + dreiecksbytes))
+        aus.write(struct.pack("<I4s", len(text), b"JSON") + text)
+        aus.write(struct.pack("<I4s", punktbytes + dreiecksbytes,
+                              b"BIN\0"))
+        for punkte in _punktbloecke(netz):
+            aus.write(_glb_punkte(punkte).tobytes())
+        for dreiecke in _dreiecksbloecke(netz):
+            aus.write(dreiecke.astype("<u4").tobytes())
+
+
+### Alle Ausgabedateien ###
+
+def exportiere(auftraege, prozesse=1, kontext=None, log=print):
+    """Schreibt die Ausgabedateien.
+
+    auftraege ist eine Liste von (meldung, funktion, ausname, argumente),
+    funktion(ausname, *argumente) schreibt eine Datei, meldung % ausname
+    wird vorher protokolliert. Mit prozesse > 1 laufen die Aufträge
+    gleichzeitig in einem Prozesspool. Raster und Netz in den Argumenten
+    liegen dann in gemeinsamem Speicher und werden nicht für jeden
+    Auftrag kopiert. kontext ist die Startmethode für multiprocessing."""
+    prozesse = min(prozesse or os.cpu_count() or 1, len(auftraege))
+    if prozesse <= 1:
+        for meldung, funktion, ausname, argumente in auftraege:
+            log(meldung % ausname)
+            funktion(ausname, *argumente)
+        return
+
+    log("Schreibe %i Ausgabedateien mit %i Prozessen" % (len(auftraege),
+                                                          prozesse))
+    if kontext is not None:
+        kontext = multiprocessing.get_context(kontext)
+    start = time.time()
+    with GemeinsamerSpeicher() as speicher:
+        with ProcessPoolExecutor(prozesse, mp_context=kontext) as pool:
+            laufend = {}
+            for meldung, funktion, ausname, argumente in auftraege:
+                log(meldung % ausname)
+                argumente = [speicher.teile(a) for a in argumente]
+                laufend[pool.submit(funktion, ausname, *argumente)] = ausname
+            for fertig, auftrag in enumerate(as_completed(laufend), 1):
+                auftrag.result()
+                log("Fertig: %s (%i/%i, %.1f s)" % (
+                    laufend[auftrag], fertig, len(auftraege),
+                    time.time()-start))
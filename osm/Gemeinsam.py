@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# NumPy-Arrays in gemeinsamem Speicher für Arbeitsprozesse.
+
+# Wenn ein Hoehenraster oder Dreiecksnetz an einen Prozesspool übergeben
+# wird, kopiert pickle normalerweise alle Arrays für jeden Auftrag in den
+# Arbeitsprozess. Bei einem Raster von einigen tausend Punkten im Quadrat
+# sind das schnell mehrere hundert MB pro Auftrag. Liegen die Arrays in
+# einem SharedMemory-Block, wird stattdessen nur dessen Name übertragen;
+# der Arbeitsprozess blendet denselben Speicher ein.
+
+import copy
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Im Arbeitsprozess eingeblendete Blöcke, nach Namen. Sie bleiben bis zum
+# Ende des Prozesses offen, damit weitere Aufträge sie wiederverwenden.
+_geoeffnet = {}
+
+
+def _oeffne(name, form, dtype):
+    "Blendet ein Array aus dem gemeinsamen Speicherblock name ein"
+    if name not in _geoeffnet:
+        _geoeffnet[name] = shared_memory.SharedMemory(name)
+    return np.ndarray(form, dtype, buffer=_geoeffnet[name].buf)
+
+
+class GeteiltesArray(np.ndarray):
+    "Array in einem SharedMemory-Block; pickle überträgt nur den Namen"
+
+    # Nur das Array, das den ganzen Block belegt, hat einen Namen.
+    # Ausschnitte davon werden wie gewöhnliche Arrays gepickelt.
+    blockname = None
+
+    def __reduce__(self):
+        if self.blockname is None:
+            return np.asarray(self).__reduce__()
+        return _oeffne, (self.blockname, self.shape, self.dtype)
+
+
+class GemeinsamerSpeicher:
+    """Legt Arrays für die Dauer eines with-Blocks in gemeinsamen Speicher.
+
+    Am Ende des Blocks werden alle Speicherblöcke wieder freigegeben;
+    der Prozesspool muss bis dahin beendet sein."""
+
+    def __init__(self):
+        self.bloecke = []
+        # id(Original) -> (Original, Kopie), damit dasselbe Objekt
+        # auch bei mehreren Aufträgen nur einmal kopiert wird
+        self.kopien = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *fehler):
+        self.kopien.clear()
+        for block in self.bloecke:
+            try:
+                block.close()
+            except BufferError:
+                # Es gibt noch Verweise auf das Array. Der Speicher wird
+                # dann erst mit dem letzten Verweis freigegeben.
+                pass
+            block.unlink()
+        self.bloecke.clear()
+
+    def array(self, werte):
+        "Kopie eines Arrays im gemeinsamen Speicher"
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(1, werte.nbytes))
+        self.bloecke.append(block)
+        kopie = GeteiltesArray(werte.shape, werte.dtype, buffer=block.buf)
+        kopie[...] = werte
+        kopie.blockname = block.name
+        return kopie
+
+    def teile(self, wert):
+        """Gibt wert so zurück, dass seine Arrays im gemeinsamen Speicher liegen.
+
+        Arrays werden kopiert, bei anderen Objekten (Hoehenraster,
+        Dreiecksnetz) eine flache Kopie mit kopierten Array-Attributen
+        erzeugt. Alle übrigen Werte bleiben unverändert."""
+        if id(wert) in self.kopien:
+            return self.kopien[id(wert)][1]
+        if isinstance(wert, np.ndarray):
+            kopie = self.array(wert)
+        elif hasattr(wert, "__dict__"):
+            kopie = copy.copy(wert)
+            for name, attribut in vars(wert).items():
+                if isinstance(attribut, np.ndarray):
+                    setattr(kopie, name, self.teile(attribut))
+        else:
+            return wert
+        self.kopien[id(wert)] = (wert, kopie)
+        return kopie
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Höhenwerte eines rechteckigen Geländeausschnitts als NumPy-Raster.
+
+# Früher standen alle Höhenwerte in einem Dictionary mit (x,y)-Tupeln als
+# Schlüsseln. Bei einem Quadratkilometer mit einem Meter Auflösung sind
+# das eine Million Einträge mit einzeln verpackten Gleitkommazahlen, was
+# einige hundert MB Speicher kostet. Das Raster braucht dafür nur acht
+# Byte pro Punkt.
+
+# Der Punkt (x,y) steht im Raster an der Stelle
+# ((x-ul_e)//kl, (y-ul_n)//kl), die erste Achse läuft also nach Osten,
+# die zweite nach Norden.
+
+import numpy as np
+
+
+class Hoehenraster:
+    "Höhenwerte im Raster mit Abstand kl ab der Südwestecke (ul_e, ul_n)"
+
+    def __init__(self, ul_e, ul_n, nx, ny, kl=1, dtype=np.float64):
+        self.ul_e = ul_e
+        self.ul_n = ul_n
+        self.kl = kl
+        # Noch nicht gefundene Punkte bleiben NaN.
+        self.h = np.full((nx, ny), np.nan, dtype=dtype)
+        # Nordostecke des ausgewählten Rechtecks; sie kann etwas über
+        # den letzten Rasterpunkt hinausgehen.
+        self.or_e = self.xmax
+        self.or_n = self.ymax
+
+    @classmethod
+    def fuer_rechteck(cls, ul_e, ul_n, or_e, or_n, kl=1, dtype=np.float64):
+        "Leeres Raster für alle Rasterpunkte im Rechteck"
+        raster = cls(ul_e, ul_n, (or_e-ul_e)//kl + 1, (or_n-ul_n)//kl + 1,
+                     kl, dtype)
+        raster.or_e = or_e
+        raster.or_n = or_n
+        return raster
+
+    @property
+    def nx(self):
+        return self.h.shape[0]
+
+    @property
+    def ny(self):
+        return self.h.shape[1]
+
+    @property
+    def xmax(self):
+        "Ostwert der letzten Rasterspalte"
+        return self.ul_e + (self.nx-1) * self.kl
+
+    @property
+    def ymax(self):
+        "Nordwert der letzten Rasterzeile"
+        return self.ul_n + (self.ny-1) * self.kl
+
+    def index(self, x, y):
+        "Rasterindizes zu UTM-Koordinaten (auch für Arrays)"
+        return (x - self.ul_e) // self.kl, (y - self.ul_n) // self.kl
+
+    def setze(self, x, y, h):
+        "Trägt Höhenwerte an den Koordinaten x, y (Arrays) ein"
+        i, j = self.index(x, y)
+        self.h[i, j] = h
+
+    def setze_block(self, i0, j0, block):
+        """Trägt ein Teilraster ab dem Index (i0, j0) ein.
+
+        NaN-Werte im Teilraster lassen vorhandene Höhenwerte stehen."""
+        ziel = self.h[i0:i0+block.shape[0], j0:j0+block.shape[1]]
+        np.copyto(ziel, block, where=~np.isnan(block))
+
+    def zeilen(self):
+        "Die Rasterzeilen (je alle Nordwerte zu einem Ostwert) nacheinander"
+        return iter(self.h)
+
+    def ausgeduennt(self, n):
+        "Nur jeder n-te Punkt pro Richtung"
+        return self.h[::n, ::n]
+
+    def fehlend(self):
+        "Anzahl der Rasterpunkte ohne Höhenwert"
+        return int(np.count_nonzero(np.isnan(self.h)))
+
+    def minh(self):
+        return float(np.nanmin(self.h))
+
+    def maxh(self):
+        return float(np.nanmax(self.h))
+
+    def zi(self):
+        "Höhenmatrix für Matplotlib: Zeilen nach Norden, Spalten nach Osten"
+        return self.h.T
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+# Welche XYZ-Kacheln liegen im Datenordner, und wo gibt es die übrigen?
+
+# Früher wurde für jede benötigte Kachel einzeln os.path.isfile()
+# aufgerufen und für jede fehlende Kachel die ganze Gelaendekatalog.csv
+# noch einmal geöffnet und Zeile für Zeile durchsucht. Bei großen
+# Gebieten mit vielen fehlenden Kacheln wächst der Aufwand damit
+# quadratisch. Hier wird der Ordner einmal eingelesen und der Katalog
+# einmal in ein Dictionary Kachelname -> ZIP-Archive übersetzt; alle
+# weiteren Abfragen sind dann Nachschlagen in Mengen und Dictionaries.
+
+# Der übersetzte Katalog wird neben der CSV-Datei als JSON abgelegt und
+# beim nächsten Start wiederverwendet, solange sich Größe und Zeitstempel
+# der CSV-Datei nicht ändern.
+
+# Aufbau einer Katalogzeile: zuerst der Name des ZIP-Archivs, danach die
+# Namen der darin enthaltenen XYZ-Dateien.
+
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+# Der Dateiname gibt die untere linke Ecke einer 2000x2000-m²-Kachel in
+# Kilometern an, beim Ostwert mit vorangestellter Zone.
+# Beispiel: dgm1_32368_5700_2_nw.xyz
+KACHELNAME = "dgm1_%i_%i_2_nw.xyz"
+KACHELMUSTER = re.compile(r"dgm1_(\d+)_(\d+)_2_nw\.xyz")
+KACHELGROESSE = 2000
+
+KATALOG = "Gelaendekatalog.csv"
+
+
+def kachelbereich(ul_e, ul_n, or_e, or_n):
+    "Ost- und Nordwerte [km] aller Kacheln, die das Rechteck berühren"
+    e_min = 2 * (ul_e // KACHELGROESSE)
+    e_max = 2 * (or_e // KACHELGROESSE)
+    n_min = 2 * (ul_n // KACHELGROESSE)
+    n_max = 2 * (or_n // KACHELGROESSE)
+    return range(e_min, e_max+1, 2), range(n_min, n_max+1, 2)
+
+
+def kachelnamen(ul_e, ul_n, or_e, or_n):
+    "Namen aller Kacheln im Rechteck, von West nach Ost und Süd nach Nord"
+    es, ns = kachelbereich(ul_e, ul_n, or_e, or_n)
+    return [KACHELNAME % (e, n) for e in es for n in ns]
+
+
+def ersetze_datei(ziel, schreibe, modus="wb"):
+    """Schreibt ziel mit schreibe(datei) über eine temporäre Datei
+
+    Die fertige Datei wird umbenannt, parallel laufende Programme sehen
+    also nie eine halbe Datei. Bricht das Schreiben ab, auch mit
+    SystemExit beim Beenden eines Prozesses, wird sie wieder gelöscht."""
+    fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(ziel)[1],
+                               dir=os.path.dirname(os.path.abspath(ziel)))
+    try:
+        with os.fdopen(fd, modus) as aus:
+            schreibe(aus)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, ziel)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class Katalog:
+    "Zuordnung Kachelname -> ZIP-Archive aus der Gelaendekatalog.csv"
+
+    def __init__(self, pfad=KATALOG):
+        self.pfad = pfad
+        self.archive = {}
+        if os.path.isfile(pfad):
+            self.archive = self._lade_index() or self._lies_csv()
+
+    def _indexpfad(self):
+        return self.pfad + ".index.json"
+
+    def _schluessel(self):
+        info = os.stat(self.pfad)
+        return [info.st_size, info.st_mtime_ns]
+
+    def _lade_index(self):
+        try:
+            with open(self._indexpfad()) as datei:
+                index = json.load(datei)
+        except (OSError, ValueError):
+            return None
+        if index.get("schluessel") != self._schluessel():
+            return None
+        return index.get("archive")
+
+    def _lies_csv(self):
+        archive = {}
+        with open(self.pfad) as csv:
+            for zeile in csv:
+                teile = zeile.split()
+                if not teile:
+                    continue
+                zip_name = teile[0]
+                for xyz_name in KACHELMUSTER.finditer(zeile, 1):
+                    liste = archive.setdefault(xyz_name.group(), [])
+                    if zip_name not in liste:
+                        liste.append(zip_name)
+        self._speichere_index(archive)
+        return archive
+
+    def _speichere_index(self, archive):
+        inhalt = {"schluessel": self._schluessel(), "archive": archive}
+        try:
+            ersetze_datei(self._indexpfad(),
+                          lambda aus: json.dump(inhalt, aus), "w")
+        except OSError:
+            # Ohne Schreibrecht wird der Katalog eben jedes Mal gelesen.
+            pass
+
+    def __len__(self):
+        return len(self.archive)
+
+    def fundorte(self, xyz_namen):
+        """ZIP-Archive, in denen die Kacheln zu finden sind.
+
+        Jedes Archiv erscheint nur einmal, in der Reihenfolge der Kacheln
+        und innerhalb einer Kachel in der Reihenfolge des Katalogs."""
+        gefunden = {}
+        for xyz_name in xyz_namen:
+            for zip_name in self.archive.get(xyz_name, ()):
+                gefunden.setdefault(zip_name, None)
+        return list(gefunden)
+
+
+class Kachelbestand:
+    "Die XYZ-Kacheln in einem Datenordner"
+
+    def __init__(self, ordner, katalog=None):
+        self.ordner = ordner
+        self.katalog = katalog
+        self.aktualisiere()
+
+    def aktualisiere(self):
+        "Liest den Ordner (neu) ein"
+        self.kacheln = {}
+        with os.scandir(self.ordner) as eintraege:
+            for eintrag in eintraege:
+                treffer = KACHELMUSTER.fullmatch(eintrag.name)
+                if treffer and eintrag.is_file():
+                    e, n = map(int, treffer.groups())
+                    self.kacheln[e, n] = eintrag.name
+
+    def __len__(self):
+        return len(self.kacheln)
+
+    def __contains__(self, xyz_name):
+        treffer = KACHELMUSTER.fullmatch(xyz_name)
+        return bool(treffer) and tuple(map(int, treffer.groups())) in \
+            self.kacheln
+
+    def pfad(self, xyz_name):
+        return os.path.join(self.ordner, xyz_name)
+
+    def abdeckung(self, ul_e, ul_n, or_e, or_n):
+        """Vorhandene Kacheln im Rechteck als Bitmap.
+
+        Liefert die Ost- und Nordwerte [km] der Kacheln und ein
+        boolesches Array [Ost, Nord], das für jede vorhandene Kachel
+        True ist."""
+        es, ns = kachelbereich(ul_e, ul_n, or_e, or_n)
+        bitmap = np.zeros((len(es), len(ns)), dtype=bool)
+        for i, e in enumerate(es):
+            for j, n in enumerate(ns):
+                bitmap[i, j] = (e, n) in self.kacheln
+        return es, ns, bitmap
+
+    def fehlende(self, ul_e, ul_n, or_e, or_n):
+        "Namen der Kacheln im Rechteck, die im Ordner fehlen"
+        es, ns, bitmap = self.abdeckung(ul_e, ul_n, or_e, or_n)
+        return [KACHELNAME % (es[i], ns[j])
+                for i, j in zip(*np.nonzero(~bitmap))]
+
+    def fehlende_archive(self, ul_e, ul_n, or_e, or_n):
+        "ZIP-Archive laut Katalog, welche die fehlenden Kacheln enthalten"
+        if self.katalog is None:
+            return []
+        return self.katalog.fundorte(self.fehlende(ul_e, ul_n, or_e, or_n))
@@ -0,0 +1,1027 @@
+#!/usr/bin/env python3
+
+# Einlesen der XYZ-Kacheln des DGM1 NRW mit NumPy.
+
+# Eine vollständige Kachel von 2000×2000 m² hat vier Millionen Zeilen.
+# Zeile für Zeile mit split() und float() gelesen, dauert das pro Kachel
+# eine kleine Ewigkeit. Hier werden stattdessen große Blöcke der Datei
+# auf einmal in NumPy-Arrays umgewandelt. Ausschnitt, horizontale
+# Ausdünnung und Rundung der Höhenwerte werden dann für den ganzen Block
+# mit Array-Operationen erledigt.
+
+# Die Ergebnisse sind mit denen der alten Zeilenschleife identisch,
+# einschließlich des Abbruchs beim Lesen einer fehlerhaften Zeile.
+
+# Beispiel für eine Zeile aus Bochum:
+# 32372000.00 5706000.00   61.32
+
+import glob
+import io
+import json
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from hashlib import sha1
+
+import numpy as np
+
+from Hoehenraster import Hoehenraster
+from Kachelbestand import (KACHELGROESSE, KACHELMUSTER, kachelnamen,
+                           ersetze_datei)
+
+# So viele Bytes werden auf einmal gelesen und umgewandelt (16 MiB,
+# das sind bei den NRW-Dateien etwa eine halbe Million Zeilen).
+BLOCKGROESSE = 1 << 24
+
+# Stufen der Höhenpyramide im Kachelcache: Kantenlänge der gemittelten
+# Blöcke in Rasterpunkten (bei DGM1 also Metern)
+STUFEN = (2, 4, 8, 16, 32)
+
+# So viele Rasterpunkte hat ein Streifen eines Streifenrasters höchstens
+# (mindestens aber zwei Zeilen).
+STREIFENPUNKTE = 1 << 20
+
+
+def runde_hoehen(h, kh):
+    "Rundet Höhenwerte [m] auf ein Vielfaches von kh Zentimetern"
+    if kh == 1:
+        return h
+    # Entspricht round(round(h*100/kh)*kh/100, 2) für jeden Einzelwert.
+    return np.round(np.round(h*100/kh)*kh/100, 2)
+
+
+def _zeilenweise(block):
+    """Wandelt einen Block Zeile für Zeile um (langsamer Weg).
+
+    Wird nur benutzt, wenn ein Block nicht aus lauter sauberen
+    Dreierzeilen besteht. Liefert die Werte bis zur ersten fehlerhaften
+    Zeile und diese Zeile selbst (oder None)."""
+    werte = []
+    for zeile in io.StringIO(block.decode()):
+        try:
+            x, y, h = zeile.split()
+            werte.append((int(float(x)), int(float(y)), float(h)))
+        except ValueError:
+            return np.array(werte, dtype=np.float64).reshape(-1, 3), zeile
+    return np.array(werte, dtype=np.float64).reshape(-1, 3), None
+
+
+def _wandle_block(block):
+    "Wandelt einen Block vollständiger Zeilen in ein (n, 3)-Array um"
+    if not block.endswith(b"\n"):
+        block += b"\n"
+    try:
+        werte = np.loadtxt(io.BytesIO(block), dtype=np.float64,
+                           comments=None, ndmin=2)
+    except ValueError:
+        return _zeilenweise(block)
+    # Leerzeilen überspringt loadtxt stillschweigend, die alte Schleife
+    # hat dort aber abgebrochen.
+    if werte.shape != (block.count(b"\n"), 3):
+        return _zeilenweise(block)
+    return werte, None
+
+
+def _ist_zahl(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _wandle_streng(block, pfad, zeile):
+    """Wandelt einen Block mit x, y und h in den ersten drei Spalten um
+
+    Weitere Spalten und Leerzeilen werden übergangen. Bei einer
+    fehlerhaften Zeile gibt es ValueError mit Datei, Zeilennummer (die
+    erste Zeile des Blocks hat die Nummer zeile) und Zeile."""
+    try:
+        return np.loadtxt(io.BytesIO(block), dtype=np.float64,
+                          usecols=(0, 1, 2), comments=None, ndmin=2)
+    except ValueError:
+        for nummer, text in enumerate(block.splitlines(), zeile):
+            felder = text.split()
+            if felder and (len(felder) < 3
+                           or not all(map(_ist_zahl, felder[:3]))):
+                raise ValueError("%s, Zeile %i: x y h erwartet, gefunden %r"
+                                 % (pfad, nummer, text.decode(
+                                     errors="replace").strip())) from None
+        raise
+
+
+def lies_bloecke(pfad, blockgroesse=BLOCKGROESSE, streng=False):
+    """Liest eine XYZ-Datei blockweise.
+
+    Liefert für jeden Block ein (n, 3)-Array mit x, y und h. Bei einer
+    fehlerhaften Zeile wird wie bisher eine Meldung ausgegeben und das
+    Lesen der Datei beendet.
+    Mit streng=True zählen nur die ersten drei Spalten, Leerzeilen werden
+    übersprungen, und eine fehlerhafte Zeile gibt ValueError (siehe
+    _wandle_streng)."""
+    zeile = 1
+    rest = b""
+    with open(pfad, "rb") as dgm:
+        while True:
+            daten = dgm.read(blockgroesse)
+            if not daten:
+                block, rest = rest, b""
+            else:
+                # Nur vollständige Zeilen umwandeln, den Rest aufheben.
+                daten = rest + daten
+                ende = daten.rfind(b"\n") + 1
+                block, rest = daten[:ende], daten[ende:]
+            if streng:
+                if block.strip():
+                    yield _wandle_streng(block, pfad, zeile)
+                zeile += block.count(b"\n")
+            elif block:
+                werte, fehler = _wandle_block(block)
+                yield werte
+                if fehler is not None:
+                    print("Abbruch, falsches Format:", fehler)
+                    return
+            if not daten:
+                return
+
+
+def waehle_punkte(werte, ul_e, ul_n, or_e, or_n, kl=1, kh=1):
+    """Schneidet Punkte auf das Rechteck zu und dünnt sie aus.
+
+    werte ist ein (n, 3)-Array mit x, y und h. Zurückgegeben werden die
+    ganzzahligen Koordinaten und die gegebenenfalls gerundeten Höhen
+    aller Punkte, die im Rechteck und im Raster mit Abstand kl liegen."""
+    # int(float(x)) schneidet die Nachkommastellen ab, astype auch.
+    x = werte[:, 0].astype(np.int64)
+    y = werte[:, 1].astype(np.int64)
+    auswahl = (ul_e <= x) & (x <= or_e) & (ul_n <= y) & (y <= or_n)
+    if kl != 1:
+        auswahl &= ((x - ul_e) % kl == 0) & ((y - ul_n) % kl == 0)
+    return x[auswahl], y[auswahl], runde_hoehen(werte[auswahl, 2], kh)
+
+
+def lies_kachel(pfad, ul_e, ul_n, or_e, or_n, kl=1, kh=1,
+                blockgroesse=BLOCKGROESSE, cache=None, index=False):
+    """Liest die benötigten Punkte einer XYZ-Kachel.
+
+    Liefert drei Arrays x, y und h in der Reihenfolge der Datei. Mit
+    einem Kachelcache wird statt der Textdatei dessen Binärkopie gelesen
+    (und beim ersten Mal angelegt). Mit index=True werden über den
+    Zeilenindex nur die Abschnitte der Datei gelesen, die im Rechteck
+    liegen."""
+    if cache is not None:
+        return cache.lies_kachel(pfad, ul_e, ul_n, or_e, or_n, kl, kh)
+    if index:
+        zeilenindex = Zeilenindex.fuer_datei(pfad)
+        if zeilenindex is not None:
+            bloecke = zeilenindex.lies_bloecke(pfad, ul_e, ul_n, or_e, or_n,
+                                               kl)
+        else:
+            bloecke = lies_bloecke(pfad, blockgroesse)
+    else:
+        bloecke = lies_bloecke(pfad, blockgroesse)
+    xs, ys, hs = [], [], []
+    for werte in bloecke:
+        x, y, h = waehle_punkte(werte, ul_e, ul_n, or_e, or_n, kl, kh)
+        xs.append(x)
+        ys.append(y)
+        hs.append(h)
+    if not hs:
+        return (np.empty(0, np.int64), np.empty(0, np.int64),
+                np.empty(0, np.float64))
+    return np.concatenate(xs), np.concatenate(ys), np.concatenate(hs)
+
+
+def kachel_als_raster(pfad, blockgroesse=BLOCKGROESSE):
+    """Liest eine ganze XYZ-Kachel in ein Raster mit einem Meter Abstand.
+
+    Liefert die Koordinaten (x0, y0) des ersten Rasterpunkts und ein
+    Array h[x-x0, y-y0]. Punkte, die in der Datei fehlen, sind NaN."""
+    xs, ys, hs = [], [], []
+    for werte in lies_bloecke(pfad, blockgroesse):
+        xs.append(werte[:, 0].astype(np.int64))
+        ys.append(werte[:, 1].astype(np.int64))
+        hs.append(werte[:, 2])
+    if not hs:
+        return 0, 0, np.empty((0, 0), np.float64)
+    x = np.concatenate(xs)
+    y = np.concatenate(ys)
+    x0, y0 = int(x.min()), int(y.min())
+    h = np.full((int(x.max())-x0+1, int(y.max())-y0+1), np.nan)
+    # Doppelte Punkte: wie im alten Dictionary gewinnt der letzte.
+    h[x-x0, y-y0] = np.concatenate(hs)
+    return x0, y0, h
+
+
+def schneide_raster(x0, y0, h, ul_e, ul_n, or_e, or_n, kl=1):
+    """Schneidet aus einem Kachelraster die Punkte des Rechtecks aus.
+
+    Liefert die Rasterindizes (i, j) des ersten Punkts bezogen auf
+    (ul_e, ul_n) im Abstand kl und den Teilausschnitt von h. Liegt die
+    Kachel außerhalb, ist der Ausschnitt leer."""
+    nx, ny = h.shape
+    # Erster Rasterpunkt im Abstand kl ab ul_e, der in der Kachel liegt.
+    xa = ul_e + -(-max(x0-ul_e, 0) // kl) * kl
+    ya = ul_n + -(-max(y0-ul_n, 0) // kl) * kl
+    xb = min(or_e, x0+nx-1)
+    yb = min(or_n, y0+ny-1)
+    if xa > xb or ya > yb:
+        return 0, 0, h[:0, :0]
+    return ((xa-ul_e)//kl, (ya-ul_n)//kl,
+            h[xa-x0:xb-x0+1:kl, ya-y0:yb-y0+1:kl])
+
+
+def verkleinere(h, s):
+    """Mittelt Blöcke von s×s Punkten eines Kachelrasters.
+
+    Der Block (bi, bj) umfasst h[s*bi:s*bi+s, s*bj:s*bj+s]; am Rand sind
+    die Blöcke entsprechend kleiner. Fehlende Punkte (NaN) zählen nicht
+    mit, ein ganz leerer Block bleibt NaN."""
+    nx, ny = h.shape
+    h = np.pad(h, ((0, -nx % s), (0, -ny % s)), constant_values=np.nan)
+    bloecke = h.reshape(h.shape[0]//s, s, h.shape[1]//s, s)
+    gueltig = ~np.isnan(bloecke)
+    summe = np.where(gueltig, bloecke, 0).sum(axis=(1, 3))
+    anzahl = gueltig.sum(axis=(1, 3))
+    return np.divide(summe, anzahl, out=np.full(summe.shape, np.nan),
+                     where=anzahl > 0)
+
+
+def stufe_passt(s, x0, y0, ul_e, ul_n, kl):
+    """Ob die Pyramidenstufe s für das Raster ab (ul_e, ul_n) mit Abstand
+    kl taugt: Jeder Rasterpunkt muss die Südwestecke eines Blocks sein.
+
+    Sonst gehörte der Mittelwert eines Blocks zu einem bis zu s-1 m
+    entfernten Punkt."""
+    return kl % s == 0 and (ul_e-x0) % s == 0 and (ul_n-y0) % s == 0
+
+
+def schneide_stufe(x0, y0, hs, s, form, ul_e, ul_n, or_e, or_n, kl):
+    """Wie schneide_raster(), aber aus der Pyramidenstufe s.
+
+    form ist die Größe des vollen Kachelrasters. Jeder Punkt des
+    Rechtecks bekommt den Mittelwert des s×s-Blocks, in dem er liegt;
+    passend ist das nur, wenn stufe_passt()."""
+    nx, ny = form
+    xa = ul_e + -(-max(x0-ul_e, 0) // kl) * kl
+    ya = ul_n + -(-max(y0-ul_n, 0) // kl) * kl
+    xb = min(or_e, x0+nx-1)
+    yb = min(or_n, y0+ny-1)
+    if xa > xb or ya > yb:
+        return 0, 0, hs[:0, :0]
+    bi = (np.arange(xa, xb+1, kl) - x0) // s
+    bj = (np.arange(ya, yb+1, kl) - y0) // s
+    return (xa-ul_e)//kl, (ya-ul_n)//kl, hs[np.ix_(bi, bj)]
+
+
+def schneide_kachel(quelle, pfad, ul_e, ul_n, or_e, or_n, kl=1, kh=1):
+    """Wie lies_kachel(), aber aus fertigen Kachelrastern.
+
+    quelle ist ein Kachelcache oder Kachelspeicher; er liefert mit
+    lade() bzw. lade_stufe() das Raster der Kachel."""
+    s = quelle.stufe(kl) if quelle.pyramide else 1
+    x0, y0, h = quelle.lade(pfad)
+    if s > 1 and stufe_passt(s, x0, y0, ul_e, ul_n, kl):
+        x0, y0, hs, form = quelle.lade_stufe(pfad, s)
+        i0, j0, teil = schneide_stufe(x0, y0, hs, s, form,
+                                      ul_e, ul_n, or_e, or_n, kl)
+    else:
+        i0, j0, teil = schneide_raster(x0, y0, h, ul_e, ul_n, or_e, or_n, kl)
+    i, j = np.nonzero(~np.isnan(teil))
+    return (ul_e + (i0+i)*kl, ul_n + (j0+j)*kl,
+            runde_hoehen(np.asarray(teil[i, j], np.float64), kh))
+
+
+class Kachelcache:
+    """Binäre Kopien der XYZ-Kacheln als memory-mappbare .npy-Dateien.
+
+    Beim ersten Lesen wird jede Kachel als Raster gespeichert, spätere
+    Läufe blenden die Kopie nur noch per mmap ein und schneiden den
+    gesuchten Ausschnitt heraus. Ein Eintrag gehört zu Pfad, Größe und
+    Änderungszeit der XYZ-Datei; ändert sich eines davon, wird die
+    Kachel neu eingelesen.
+
+    Ohne ordner liegen die Kopien neben den XYZ-Dateien. Mit max_bytes
+    werden die am längsten nicht benutzten Einträge gelöscht, sobald der
+    Cache größer wird.
+
+    Mit pyramide werden für durch 2, 4 … teilbare kl verkleinerte Stufen
+    der Kachel benutzt (siehe STUFEN), die beim ersten Bedarf als
+    <Eintrag>.s<s>.npy angelegt werden. Ein grober Lauf muss dann nur
+    einen Bruchteil der Daten einblenden. Die Höhen sind in diesem Fall
+    geglättet: Mittelwerte der Blöcke, deren Südwestecke der Rasterpunkt
+    ist, statt einzelner Messpunkte. Fällt das Raster nicht auf die
+    Blockecken (siehe stufe_passt()), gilt die volle Auflösung.
+
+    Mit voll=False speichert der Cache nur die Pyramidenstufen und keine
+    volle Kopie; das reicht für Vorschauen wie die Karte in
+    Kartenansicht.py. Die volle Auflösung wird dann jedes Mal aus der
+    XYZ-Datei gelesen."""
+
+    def __init__(self, ordner=None, max_bytes=None, pyramide=False,
+                 voll=True):
+        self.ordner = ordner
+        self.max_bytes = max_bytes
+        self.pyramide = pyramide
+        self.voll = voll
+
+    @staticmethod
+    def schluessel(pfad):
+        "Pfad, Größe und Änderungszeit der XYZ-Datei"
+        info = os.stat(pfad)
+        return os.path.abspath(pfad), info.st_size, info.st_mtime_ns
+
+    def eintrag(self, pfad):
+        "Pfade der .npy-Datei und ihrer .json-Beschreibung"
+        quelle, groesse, mtime = self.schluessel(pfad)
+        kennung = sha1(f"{quelle}|{groesse}|{mtime}".encode()).hexdigest()
+        ordner = self.ordner or os.path.dirname(quelle)
+        basis = os.path.join(ordner, "%s.%s" % (os.path.basename(quelle),
+                                                kennung[:16]))
+        return basis+".npy", basis+".json"
+
+    def eintraege(self, ordner):
+        "Alle Cache-Einträge in einem Ordner als (npy, json)"
+        liste = []
+        for datei in os.listdir(ordner):
+            if datei.endswith(".json"):
+                npy = os.path.join(ordner, datei[:-5]+".npy")
+                if os.path.isfile(npy) or self._stufendateien(npy):
+                    liste.append((npy, os.path.join(ordner, datei)))
+        return liste
+
+    def erzeuge(self, pfad):
+        "Liest die XYZ-Datei und legt den Cache-Eintrag (neu) an"
+        npy, meta = self.eintrag(pfad)
+        quelle, groesse, mtime = self.schluessel(pfad)
+        x0, y0, h = kachel_als_raster(pfad)
+        ordner = os.path.dirname(npy)
+        os.makedirs(ordner, exist_ok=True)
+        self._speichere(npy, h)
+        self._beschreibe(meta, {"quelle": quelle, "groesse": groesse,
+                                "mtime_ns": mtime, "x0": x0, "y0": y0,
+                                "form": list(h.shape),
+                                "crc32": zlib.crc32(h.tobytes())})
+        # Pyramidenstufen eines früheren Stands passen nicht mehr.
+        for datei in self._stufendateien(npy):
+            os.remove(datei)
+        self._ersetze(ordner, npy, quelle)
+        return x0, y0, h
+
+    def erzeuge_stufen(self, pfad):
+        """Legt für voll=False die Pyramidenstufen einer Kachel an und
+        liefert (x0, y0, h) des vollen Rasters"""
+        npy, meta = self.eintrag(pfad)
+        quelle, groesse, mtime = self.schluessel(pfad)
+        voll = self.pruefe(pfad)
+        if voll:
+            # Eine volle Kopie aus einem anderen Lauf ist schneller.
+            x0, y0, h = self.lade(pfad)
+        else:
+            x0, y0, h = kachel_als_raster(pfad)
+        ordner = os.path.dirname(npy)
+        os.makedirs(ordner, exist_ok=True)
+        # Die XYZ-Datei wird nur einmal gelesen, also gleich alle Stufen.
+        for s in STUFEN:
+            self._speichere(npy[:-4] + ".s%i.npy" % s, verkleinere(h, s))
+        if not voll:
+            if os.path.isfile(npy):
+                os.remove(npy)
+            self._beschreibe(meta, {"quelle": quelle, "groesse": groesse,
+                                    "mtime_ns": mtime, "x0": x0, "y0": y0,
+                                    "form": list(h.shape)})
+        self._ersetze(ordner, npy, quelle)
+        return x0, y0, h
+
+    @staticmethod
+    def _speichere(datei, h):
+        ersetze_datei(datei, lambda aus: np.save(aus, h))
+
+    @staticmethod
+    def _beschreibe(meta, beschreibung):
+        ersetze_datei(meta, lambda aus: json.dump(beschreibung, aus), "w")
+
+    def _ersetze(self, ordner, npy, quelle):
+        "Entfernt veraltete Einträge derselben XYZ-Datei und räumt auf"
+        for alt_npy, alt_meta in self.eintraege(ordner):
+            if alt_npy != npy and self._beschreibung(alt_meta).get(
+                    "quelle") == quelle:
+                self._loesche(alt_npy, alt_meta)
+        self.raeume_auf(ordner)
+
+    @staticmethod
+    def _beschreibung(meta):
+        try:
+            with open(meta) as datei:
+                return json.load(datei)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _stufendateien(npy):
+        "Die Pyramidenstufen eines Eintrags"
+        return glob.glob(glob.escape(npy[:-4]) + ".s*.npy")
+
+    @classmethod
+    def _dateien(cls, npy, meta):
+        "Alle vorhandenen Dateien eines Eintrags einschließlich der Stufen"
+        return ([datei for datei in (meta, npy) if os.path.isfile(datei)] +
+                cls._stufendateien(npy))
+
+    @classmethod
+    def _loesche(cls, npy, meta):
+        for datei in cls._dateien(npy, meta):
+            try:
+                os.remove(datei)
+            except OSError:
+                # Unter Windows lässt sich eine gerade eingeblendete
+                # Datei nicht löschen. Dann eben beim nächsten Mal.
+                pass
+
+    def pruefe(self, pfad, vollstaendig=False):
+        """Prüft, ob der Cache-Eintrag zur XYZ-Datei gültig ist.
+
+        Vollständig wird auch die Prüfsumme der Höhenwerte verglichen."""
+        npy, meta = self.eintrag(pfad)
+        beschreibung = self._beschreibung(meta)
+        quelle, groesse, mtime = self.schluessel(pfad)
+        if (beschreibung.get("quelle"), beschreibung.get("groesse"),
+                beschreibung.get("mtime_ns")) != (quelle, groesse, mtime):
+            return False
+        try:
+            h = np.load(npy, mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        if list(h.shape) != beschreibung.get("form"):
+            return False
+        if vollstaendig:
+            return zlib.crc32(np.ascontiguousarray(h).tobytes()) == \
+                beschreibung.get("crc32")
+        return True
+
+    def lade(self, pfad):
+        """Liefert (x0, y0, h) einer Kachel, h als eingeblendetes Array.
+
+        Fehlt der Eintrag, wird er angelegt."""
+        npy, meta = self.eintrag(pfad)
+        beschreibung = self._beschreibung(meta)
+        try:
+            h = np.load(npy, mmap_mode="r")
+        except (OSError, ValueError):
+            h = None
+        if h is None or list(h.shape) != beschreibung.get("form"):
+            try:
+                return self.erzeuge(pfad)
+            except OSError as fehler:
+                # Schreibgeschützter Ordner o. Ä.: ohne Cache weiter.
+                print("Kachelcache nicht verfügbar:", fehler)
+                return kachel_als_raster(pfad)
+        # Zugriffszeit für die LRU-Verdrängung merken.
+        try:
+            os.utime(npy)
+        except OSError:
+            pass
+        return beschreibung["x0"], beschreibung["y0"], h
+
+    @staticmethod
+    def stufe(kl):
+        """Größte Pyramidenstufe für den Punktabstand kl (1: keine)
+
+        Sie muss kl teilen und die Kachelgröße, damit ein an der Stufe
+        ausgerichtetes Raster in jeder Kachel auf die Blockecken fällt."""
+        return max([1] + [s for s in STUFEN
+                          if kl % s == 0 and KACHELGROESSE % s == 0])
+
+    def lade_stufe(self, pfad, s):
+        """Liefert (x0, y0, hs, form) der Pyramidenstufe s einer Kachel.
+
+        form ist die Größe des vollen Rasters. Fehlt die Stufe, wird sie
+        aus dem vollen Raster berechnet und gespeichert."""
+        if not self.voll:
+            return self._lade_vorschau(pfad, s)
+        x0, y0, h = self.lade(pfad)
+        if s == 1:
+            return x0, y0, h, h.shape
+        npy, meta = self.eintrag(pfad)
+        datei = npy[:-4] + ".s%i.npy" % s
+        try:
+            hs = np.load(datei, mmap_mode="r")
+        except (OSError, ValueError):
+            hs = None
+        if hs is None or hs.shape != (-(-h.shape[0]//s), -(-h.shape[1]//s)):
+            hs = verkleinere(h, s)
+            try:
+                self._speichere(datei, hs)
+            except OSError:
+                pass
+        return x0, y0, hs, h.shape
+
+    def _lade_vorschau(self, pfad, s):
+        "lade_stufe() für voll=False"
+        if s == 1:
+            x0, y0, h = kachel_als_raster(pfad)
+            return x0, y0, h, h.shape
+        npy, meta = self.eintrag(pfad)
+        datei = npy[:-4] + ".s%i.npy" % s
+        beschreibung = self._beschreibung(meta)
+        form = beschreibung.get("form")
+        try:
+            hs = np.load(datei, mmap_mode="r")
+        except (OSError, ValueError):
+            hs = None
+        if (hs is not None and form and
+                hs.shape == (-(-form[0]//s), -(-form[1]//s))):
+            try:
+                os.utime(datei)
+            except OSError:
+                pass
+            return beschreibung["x0"], beschreibung["y0"], hs, tuple(form)
+        try:
+            x0, y0, h = self.erzeuge_stufen(pfad)
+        except OSError as fehler:
+            print("Kachelcache nicht verfügbar:", fehler)
+            x0, y0, h = kachel_als_raster(pfad)
+        return x0, y0, verkleinere(h, s), h.shape
+
+    def lies_kachel(self, pfad, ul_e, ul_n, or_e, or_n, kl=1, kh=1):
+        "Wie lies_kachel(), aber aus der Binärkopie"
+        return schneide_kachel(self, pfad, ul_e, ul_n, or_e, or_n, kl, kh)
+
+    def groesse(self, ordner):
+        "Belegter Platz aller Einträge in einem Ordner [Byte]"
+        return sum(os.path.getsize(datei)
+                   for npy, meta in self.eintraege(ordner)
+                   for datei in self._dateien(npy, meta))
+
+    def raeume_auf(self, ordner):
+        "Löscht die am längsten unbenutzten Einträge über max_bytes"
+        if self.max_bytes is None:
+            return
+        eintraege = []
+        for npy, meta in self.eintraege(ordner):
+            try:
+                dateien = self._dateien(npy, meta)
+                eintraege.append((max(map(os.path.getmtime, dateien)),
+                                  sum(map(os.path.getsize, dateien)),
+                                  npy, meta))
+            except OSError:
+                pass
+        belegt = sum(e[1] for e in eintraege)
+        # Der neueste Eintrag bleibt auf jeden Fall erhalten.
+        for zeit, groesse, npy, meta in sorted(eintraege)[:-1]:
+            if belegt <= self.max_bytes:
+                break
+            self._loesche(npy, meta)
+            belegt -= groesse
+
+    def erneuere(self, pfade):
+        "Legt die Einträge der angegebenen XYZ-Dateien neu an"
+        for pfad in pfade:
+            self.erzeuge(pfad)
+
+
+def _lade_kachel(pfad, cache=None, stufen=()):
+    "Ganzes Kachelraster und Pyramidenstufen (im Prozesspool)"
+    if cache is not None:
+        x0, y0, h = cache.lade(pfad)
+        h = np.array(h)
+    else:
+        x0, y0, h = kachel_als_raster(pfad)
+    return x0, y0, h, {s: verkleinere(h, s) for s in stufen}
+
+
+class Kachelspeicher:
+    """Ganze Kachelraster im Hauptspeicher, für viele Rechtecke auf einmal.
+
+    Wie ein Kachelcache an lade_raster() übergeben, schneidet er die
+    Rechtecke aus den einmal gelesenen Kacheln aus, statt die Dateien
+    erneut zu lesen. Mit pyramide werden die gemittelten Stufen benutzt,
+    wo sie passen, wie beim Kachelcache."""
+
+    def __init__(self, pyramide=False):
+        self.pyramide = pyramide
+        # Pfad -> (x0, y0, h) und (Pfad, Stufe) -> hs
+        self.kacheln = {}
+        self.stufen = {}
+
+    stufe = staticmethod(Kachelcache.stufe)
+
+    def __len__(self):
+        return len(self.kacheln)
+
+    def fuelle(self, pfade, stufen=(), cache=None, prozesse=1, kontext=None,
+               log=print):
+        """Liest alle noch fehlenden Kacheln genau einmal ein.
+
+        stufen sind die Pyramidenstufen, die zusätzlich berechnet werden.
+        Mit einem Kachelcache werden dessen Binärkopien benutzt. Mit
+        prozesse > 1 werden die Kacheln in einem Prozesspool gelesen."""
+        stufen = sorted(set(stufen) - {1}) if self.pyramide else []
+        pfade = [pfad for pfad in dict.fromkeys(map(os.path.abspath, pfade))
+                 if pfad not in self.kacheln]
+        prozesse = min(prozesse or os.cpu_count() or 1, len(pfade))
+        if prozesse <= 1:
+            ergebnisse = ((pfad, _lade_kachel(pfad, cache, stufen))
+                          for pfad in pfade)
+            self._trage_ein(ergebnisse, len(pfade), log)
+            return
+        log("Lese %i XYZ-Dateien mit %i Prozessen" % (len(pfade), prozesse))
+        if kontext is not None:
+            kontext = multiprocessing.get_context(kontext)
+        with ProcessPoolExecutor(prozesse, mp_context=kontext) as pool:
+            auftraege = {pool.submit(_lade_kachel, pfad, cache, stufen): pfad
+                         for pfad in pfade}
+            self._trage_ein(((auftraege[auftrag], auftrag.result())
+                             for auftrag in as_completed(auftraege)),
+                            len(pfade), log)
+
+    def _trage_ein(self, ergebnisse, anzahl, log):
+        for fertig, (pfad, (x0, y0, h, stufen)) in enumerate(ergebnisse, 1):
+            self.kacheln[pfad] = (x0, y0, h)
+            for s, hs in stufen.items():
+                self.stufen[pfad, s] = hs
+            log("Verwende XYZ-Datei %s (%i/%i)" % (
+                os.path.basename(pfad), fertig, anzahl))
+
+    def teile(self, gemeinsam):
+        """Kopie, deren Raster im GemeinsamerSpeicher gemeinsam liegen.
+
+        Beim Übergeben an einen Prozesspool werden dann nur die Namen der
+        Speicherblöcke übertragen."""
+        kopie = Kachelspeicher(self.pyramide)
+        kopie.kacheln = {pfad: (x0, y0, gemeinsam.array(h))
+                         for pfad, (x0, y0, h) in self.kacheln.items()}
+        kopie.stufen = {schluessel: gemeinsam.array(hs)
+                        for schluessel, hs in self.stufen.items()}
+        return kopie
+
+    def lade(self, pfad):
+        "Liefert (x0, y0, h) einer eingelesenen Kachel"
+        return self.kacheln[os.path.abspath(pfad)]
+
+    def lade_stufe(self, pfad, s):
+        "Liefert (x0, y0, hs, form) der Pyramidenstufe s einer Kachel"
+        x0, y0, h = self.lade(pfad)
+        if s == 1:
+            return x0, y0, h, h.shape
+        return x0, y0, self.stufen[os.path.abspath(pfad), s], h.shape
+
+    def lies_kachel(self, pfad, ul_e, ul_n, or_e, or_n, kl=1, kh=1):
+        "Wie lies_kachel(), aber aus dem Kachelspeicher"
+        return schneide_kachel(self, pfad, ul_e, ul_n, or_e, or_n, kl, kh)
+
+
+class Zeilenindex:
+    """Byte-Positionen der Zeilengruppen einer XYZ-Datei.
+
+    Die DGM1-Dateien sind regelmäßig sortiert: Alle Punkte mit demselben
+    Ostwert (bzw. Nordwert) stehen in einem zusammenhängenden Abschnitt,
+    in dem der andere Wert in festen Schritten wächst. Der Index merkt
+    sich für jeden Abschnitt die Byte-Position, die Zeilenzahl und, wenn
+    alle Zeilen gleich lang sind, die Zeilenlänge. Damit lässt sich für
+    ein kleines Rechteck direkt an die passenden Stellen der Datei
+    springen, statt alle vier Millionen Zeilen zu lesen.
+
+    Der Index wird einmalig als <Kachel>.idx.npz neben der Kachel (oder
+    in ordner) gespeichert und bei geänderter Datei neu erzeugt."""
+
+    # Spalten der Abschnittstabelle
+    WERT, POSITION, ANZAHL, ANFANG, SCHRITT, LAENGE = range(6)
+
+    def __init__(self, achse, abschnitte, dateiende):
+        # achse 0: Abschnitte nach Ostwert, 1: nach Nordwert
+        self.achse = achse
+        self.abschnitte = abschnitte
+        self.dateiende = dateiende
+
+    @staticmethod
+    def pfad(pfad, ordner=None):
+        ordner = ordner or os.path.dirname(os.path.abspath(pfad))
+        return os.path.join(ordner, os.path.basename(pfad)+".idx.npz")
+
+    @classmethod
+    def fuer_datei(cls, pfad, ordner=None):
+        """Lädt den Index einer XYZ-Datei oder legt ihn an.
+
+        Liefert None, wenn die Datei nicht regelmäßig aufgebaut ist."""
+        info = os.stat(pfad)
+        idx = cls.pfad(pfad, ordner)
+        try:
+            with np.load(idx) as daten:
+                groesse, mtime, achse = daten["kennung"].tolist()
+                if (groesse, mtime) == (info.st_size, info.st_mtime_ns):
+                    if achse < 0:
+                        return None
+                    return cls(achse, daten["abschnitte"], groesse)
+        except (OSError, ValueError, KeyError):
+            pass
+        zeilenindex = cls.erzeuge(pfad)
+        # Auch "kein Index möglich" wird vermerkt (achse -1).
+        if zeilenindex is None:
+            achse, abschnitte = -1, np.empty((0, 6), np.int64)
+        else:
+            achse, abschnitte = zeilenindex.achse, zeilenindex.abschnitte
+        try:
+            ersetze_datei(idx, lambda aus: np.savez(
+                aus, abschnitte=abschnitte, kennung=np.array(
+                    [info.st_size, info.st_mtime_ns, achse], np.int64)))
+        except OSError as fehler:
+            print("Zeilenindex kann nicht gespeichert werden:", fehler)
+        return zeilenindex
+
+    @classmethod
+    def erzeuge(cls, pfad, blockgroesse=BLOCKGROESSE):
+        "Liest die Datei einmal vollständig und baut den Index auf"
+        xs, ys, anfaenge = [], [], []
+        # Byte-Position des aktuellen Blocks in der Datei
+        position = 0
+        rest = b""
+        with open(pfad, "rb") as dgm:
+            while True:
+                daten = dgm.read(blockgroesse)
+                if daten:
+                    daten = rest + daten
+                    ende = daten.rfind(b"\n") + 1
+                    block, rest = daten[:ende], daten[ende:]
+                else:
+                    block, rest = rest, b""
+                if block:
+                    werte, fehler = _wandle_block(block)
+                    if fehler is not None:
+                        # Fehlerhafte Zeilen: kein Index, lieber alles lesen.
+                        return None
+                    if not block.endswith(b"\n"):
+                        block += b"\n"
+                    zeilenenden = np.flatnonzero(
+                        np.frombuffer(block, np.uint8) == ord("\n"))
+                    anfaenge.append(position + np.concatenate(
+                        ([0], zeilenenden[:-1] + 1)))
+                    xs.append(werte[:, 0].astype(np.int64))
+                    ys.append(werte[:, 1].astype(np.int64))
+                    position += len(block)
+                if not daten:
+                    break
+        if not xs:
+            return None
+        x = np.concatenate(xs)
+        y = np.concatenate(ys)
+        anfang = np.concatenate(anfaenge)
+        dateiende = os.path.getsize(pfad)
+
+        # Nach welcher Koordinate ist die Datei gruppiert? Nach der,
+        # die sich seltener ändert.
+        wechsel_x = np.count_nonzero(np.diff(x))
+        wechsel_y = np.count_nonzero(np.diff(y))
+        achse = 0 if wechsel_x <= wechsel_y else 1
+        gruppe, innen = (x, y) if achse == 0 else (y, x)
+
+        start = np.concatenate(([0], np.flatnonzero(np.diff(gruppe)) + 1))
+        stop = np.append(start[1:], len(gruppe))
+        ende = np.append(anfang[1:], dateiende)
+        abschnitte = np.zeros((len(start), 6), np.int64)
+        abschnitte[:, cls.WERT] = gruppe[start]
+        abschnitte[:, cls.POSITION] = anfang[start]
+        abschnitte[:, cls.ANZAHL] = stop - start
+        abschnitte[:, cls.ANFANG] = innen[start]
+        for k, (a, b) in enumerate(zip(start, stop)):
+            n = b - a
+            schritt = innen[a+1] - innen[a] if n > 1 else 1
+            # Gleich lange Zeilen mit gleichmäßigem Abstand? Die letzte
+            # Zeile der Datei hat eventuell keinen Zeilenumbruch.
+            laengen = ende[a:b] - anfang[a:b]
+            if b == len(gruppe):
+                laengen = laengen[:-1]
+            if (schritt > 0 and (len(laengen) == 0 or
+                                 np.all(laengen == laengen[0])) and
+                    np.array_equal(innen[a:b],
+                                   innen[a] + schritt*np.arange(n))):
+                abschnitte[k, cls.SCHRITT] = schritt
+                abschnitte[k, cls.LAENGE] = (laengen[0] if len(laengen)
+                                             else ende[a] - anfang[a])
+        return cls(achse, abschnitte, dateiende)
+
+    def bereiche(self, ul_e, ul_n, or_e, or_n, kl=1):
+        """Byte-Bereiche (von, bis) der Datei, die Punkte im Rechteck
+        auf dem Raster mit Abstand kl enthalten können"""
+        a = self.abschnitte
+        if self.achse == 0:
+            unten, oben, innen_unten, innen_oben = ul_e, or_e, ul_n, or_n
+        else:
+            unten, oben, innen_unten, innen_oben = ul_n, or_n, ul_e, or_e
+        wert = a[:, self.WERT]
+        auswahl = (unten <= wert) & (wert <= oben) & ((wert-unten) % kl == 0)
+        von = a[auswahl, self.POSITION]
+        bis = np.append(a[1:, self.POSITION], self.dateiende)[auswahl]
+        # Innerhalb regelmäßiger Abschnitte nur die Zeilen im Rechteck.
+        a = a[auswahl]
+        regel = a[:, self.LAENGE] > 0
+        r = a[regel]
+        schritt = r[:, self.SCHRITT]
+        erste = np.maximum(0, -((r[:, self.ANFANG] - innen_unten) //
+                                schritt))
+        letzte = np.minimum(r[:, self.ANZAHL] - 1,
+                            (innen_oben - r[:, self.ANFANG]) // schritt)
+        von[regel] = r[:, self.POSITION] + erste*r[:, self.LAENGE]
+        bis[regel] = np.minimum(bis[regel], r[:, self.POSITION] +
+                                (letzte+1)*r[:, self.LAENGE])
+        gueltig = von < bis
+        von, bis = von[gueltig], bis[gueltig]
+        # Aneinanderstoßende Bereiche zusammenfassen, das spart Aufrufe.
+        bereiche = []
+        for v, b in zip(von.tolist(), bis.tolist()):
+            if bereiche and bereiche[-1][1] == v:
+                bereiche[-1][1] = b
+            else:
+                bereiche.append([v, b])
+        return bereiche
+
+    def lies_bloecke(self, pfad, ul_e, ul_n, or_e, or_n, kl=1,
+                     blockgroesse=BLOCKGROESSE):
+        """Wie lies_bloecke(), aber nur für die Bereiche im Rechteck"""
+        with open(pfad, "rb") as dgm:
+            for von, bis in self.bereiche(ul_e, ul_n, or_e, or_n, kl):
+                dgm.seek(von)
+                rest = b""
+                uebrig = bis - von
+                while uebrig > 0:
+                    daten = dgm.read(min(blockgroesse, uebrig))
+                    if not daten:
+                        break
+                    uebrig -= len(daten)
+                    daten = rest + daten
+                    if uebrig > 0:
+                        # Nur vollständige Zeilen umwandeln.
+                        ende = daten.rfind(b"\n") + 1
+                        daten, rest = daten[:ende], daten[ende:]
+                    if daten.strip():
+                        yield _wandle_block(daten)[0]
+
+
+def lies_teilraster(pfad, ul_e, ul_n, or_e, or_n, kl=1, kh=1, cache=None,
+                    index=False):
+    """Liest eine Kachel und liefert ihren Teil des Zielrasters.
+
+    Das Ergebnis (i0, j0, block) passt an der Stelle (i0, j0) in das
+    Hoehenraster des Rechtecks. Wird in den Prozessen des Pools
+    aufgerufen, deshalb nur ein kleines Array statt vieler Punkte."""
+    x, y, h = lies_kachel(pfad, ul_e, ul_n, or_e, or_n, kl, kh, cache=cache,
+                          index=index)
+    if not len(h):
+        return 0, 0, np.empty((0, 0), np.float64)
+    i = (x - ul_e) // kl
+    j = (y - ul_n) // kl
+    i0, j0 = int(i.min()), int(j.min())
+    block = np.full((int(i.max())-i0+1, int(j.max())-j0+1), np.nan)
+    block[i-i0, j-j0] = h
+    return i0, j0, block
+
+
+def lade_raster(pfade, ul_e, ul_n, or_e, or_n, kl=1, kh=1, cache=None,
+                index=False, prozesse=1, kontext=None, log=print):
+    """Liest alle Kacheln in ein Hoehenraster für das Rechteck.
+
+    Mit prozesse > 1 werden die Kacheln in einem Prozesspool gelesen,
+    jeder Prozess liefert sein Teilraster, das hier eingefügt wird.
+    Fortschrittsmeldungen gehen an log(). kontext ist die Startmethode
+    für multiprocessing (None: Voreinstellung der Plattform)."""
+    raster = Hoehenraster.fuer_rechteck(ul_e, ul_n, or_e, or_n, kl)
+    prozesse = min(prozesse or os.cpu_count() or 1, len(pfade))
+    if prozesse <= 1:
+        for pfad in pfade:
+            log("Verwende XYZ-Datei %s" % os.path.basename(pfad))
+            raster.setze(*lies_kachel(pfad, ul_e, ul_n, or_e, or_n, kl, kh,
+                                      cache=cache, index=index))
+        return raster
+
+    log("Lese %i XYZ-Dateien mit %i Prozessen" % (len(pfade), prozesse))
+    if kontext is not None:
+        kontext = multiprocessing.get_context(kontext)
+    with ProcessPoolExecutor(prozesse, mp_context=kontext) as pool:
+        auftraege = {pool.submit(lies_teilraster, pfad, ul_e, ul_n,
+                                 or_e, or_n, kl, kh, cache, index): pfad
+                     for pfad in pfade}
+        for fertig, auftrag in enumerate(as_completed(auftraege), 1):
+            raster.setze_block(*auftrag.result())
+            log("Verwende XYZ-Datei %s (%i/%i)" % (
+                os.path.basename(auftraege[auftrag]), fertig, len(pfade)))
+    return raster
+
+
+def _ohne_meldung(s, sichtbar=True):
+    pass
+
+
+class Streifenraster:
+    """Höhen eines Rechtecks, die nie ganz im Speicher liegen.
+
+    Hat dieselben Kenngrößen wie das Hoehenraster des Rechtecks, lädt die
+    Höhen aber erst beim Durchlaufen, in Streifen von Rasterzeilen (also
+    von West nach Ost). Aufeinanderfolgende Streifen teilen sich eine
+    Zeile, die mitgenommen statt neu geladen wird. Der Speicherbedarf
+    hängt damit von der Streifenbreite ab und nicht von der Fläche.
+
+    minh(), maxh() und fehlend() brauchen einen Durchlauf über alle
+    Streifen vorab; sein Ergebnis wird gemerkt. Mit einem Kachelcache
+    (und erst recht mit dessen Pyramide) ist das schnell, sonst sollte
+    index=True gesetzt sein, damit jeder Streifen nur seinen Teil der
+    XYZ-Dateien liest."""
+
+    def __init__(self, pfade, ul_e, ul_n, or_e, or_n, kl=1, kh=1,
+                 cache=None, index=False, punkte=STREIFENPUNKTE):
+        self.pfade = list(pfade)
+        self.ul_e = ul_e
+        self.ul_n = ul_n
+        self.or_e = or_e
+        self.or_n = or_n
+        self.kl = kl
+        self.kh = kh
+        self.cache = cache
+        self.index = index
+        self.nx = (or_e-ul_e)//kl + 1
+        self.ny = (or_n-ul_n)//kl + 1
+        # Zeilen pro Streifen einschließlich der gemeinsamen Zeile
+        self.breite = max(2, punkte // self.ny)
+        # (fehlend, minh, maxh) nach dem ersten Durchlauf
+        self._statistik = None
+
+    @property
+    def xmax(self):
+        "Ostwert der letzten Rasterspalte"
+        return self.ul_e + (self.nx-1) * self.kl
+
+    @property
+    def ymax(self):
+        "Nordwert der letzten Rasterzeile"
+        return self.ul_n + (self.ny-1) * self.kl
+
+    def lade_zeilen(self, i0, i1):
+        "Höhen der Rasterzeilen i0 … i1-1 als Array"
+        x0 = self.ul_e + i0*self.kl
+        x1 = self.ul_e + (i1-1)*self.kl
+        # Nur die Kacheln, die den Streifen berühren
+        namen = set(kachelnamen(x0, self.ul_n, x1, self.or_n))
+        pfade = [pfad for pfad in self.pfade
+                 if os.path.basename(pfad) in namen
+                 or not KACHELMUSTER.fullmatch(os.path.basename(pfad))]
+        return lade_raster(pfade, x0, self.ul_n, x1, self.or_n, self.kl,
+                           self.kh, cache=self.cache, index=self.index,
+                           log=_ohne_meldung).h
+
+    def grenzen(self):
+        """Zeilenbereiche der Streifen, ohne etwas zu laden.
+
+        Liefert (i0, i, i1): Der Streifen umfasst die Zeilen i0 … i1-1,
+        ab i werden sie neu geladen (davor liegt die mitgenommene)."""
+        i = 0
+        while i < self.nx:
+            i1 = min(i + self.breite - (i > 0), self.nx)
+            yield i - (i > 0), i, i1
+            i = i1
+
+    def streifen(self):
+        """Durchläuft das Raster in Streifen.
+
+        Liefert (i0, h) mit den Höhen h der Zeilen i0 … i0+len(h)-1. Die
+        letzte Zeile eines Streifens ist die erste des nächsten."""
+        uebertrag = None
+        for i0, i, i1 in self.grenzen():
+            h = self.lade_zeilen(i, i1)
+            if uebertrag is not None:
+                h = np.concatenate([uebertrag[None], h])
+            yield i0, h
+            uebertrag = h[-1].copy()
+
+    def zeilen(self):
+        "Die Rasterzeilen (je alle Nordwerte zu einem Ostwert) nacheinander"
+        for i0, h in self.streifen():
+            yield from (h if i0 == 0 else h[1:])
+
+    def ausgeduennt(self, n):
+        "Nur jeder n-te Punkt pro Richtung"
+        return np.array([zeile[::n] for i, zeile in enumerate(self.zeilen())
+                         if i % n == 0])
+
+    def statistik(self):
+        "Anzahl der fehlenden Punkte, kleinste und größte Höhe"
+        if self._statistik is None:
+            fehlend, minh, maxh = 0, np.inf, -np.inf
+            for i0, h in self.streifen():
+                teil = h if i0 == 0 else h[1:]
+                leer = np.isnan(teil)
+                fehlend += int(np.count_nonzero(leer))
+                if not leer.all():
+                    minh = min(minh, float(np.nanmin(teil)))
+                    maxh = max(maxh, float(np.nanmax(teil)))
+            self._statistik = (fehlend, minh, maxh)
+        return self._statistik
+
+    def fehlend(self):
+        "Anzahl der Rasterpunkte ohne Höhenwert"
+        return self.statistik()[0]
+
+    def minh(self):
+        return self.statistik()[1]
+
+    def maxh(self):
+        return self.statistik()[2]
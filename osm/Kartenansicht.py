@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+# Höhenkarte über den ganzen Kachelbestand für eine Oberfläche mit
+# Verschieben und Zoomen.
+
+# Ein Bildschirm zeigt nur etwa tausend Punkte pro Seite. Für jeden
+# Ausschnitt wird deshalb die Stufe gewählt, bei der ein Rasterpunkt
+# ungefähr einem Bildpunkt entspricht, und nur die Kacheln im
+# Ausschnitt werden in dieser Stufe geladen. Bis 32 m kommen die Stufen
+# aus der Höhenpyramide des Kachelcaches (siehe Kacheln.py), gröbere
+# werden daraus noch einmal gemittelt. Wer weit herauszoomt, liest also
+# pro Kachel nur die kleine 32-m-Stufe und nie die volle Auflösung. Nur
+# beim allerersten Zugriff auf eine Kachel muss der Cache die Stufe
+# einmal aus der XYZ-Datei anlegen.
+
+# Die Stufen gehören nicht zu den XYZ-Dateien des Nutzers: Eine Oberfläche
+# legt sie mit einem Kachelcache(voll=False) in KARTENCACHE ab (oder im
+# Cache-Ordner aus Einstellungen.py), ohne die vollen Kopien.
+
+# Geladen wird in einem Threadpool, die Oberfläche bleibt dabei
+# bedienbar. Aufträge für Kacheln, die nach einer Verschiebung nicht
+# mehr im Bild sind, werden verworfen, solange sie noch nicht laufen.
+# Die geladenen Kacheln liegen in einem LRU-Speicher mit fester
+# Obergrenze; beim Zurückblättern sind sie meist noch da. Eine Kachel, die
+# sich nicht laden lässt, wird mit ihrer Fehlermeldung vermerkt, ebenfalls
+# über fertig() gemeldet und nicht erneut angefordert.
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Kachelbestand import KACHELGROESSE, KACHELNAME, kachelbereich
+from Kacheln import STUFEN, kachel_als_raster, verkleinere
+
+# Stufen der Karte: Kantenlänge eines Rasterpunkts in Metern
+KARTENSTUFEN = (1,) + STUFEN + (64, 128, 256, 512)
+
+# Ordner für die Stufen der Karte
+KARTENCACHE = os.path.join(os.path.expanduser("~"), ".cache", "dgm-karte")
+
+# So viel Speicher [Byte] belegen die geladenen Kacheln höchstens.
+KARTENSPEICHER = 256 * 1024**2
+
+# So viele Kacheln werden gleichzeitig geladen.
+LADETHREADS = 2
+
+
+def kartenstufe(meter, pixel):
+    "Gröbste Stufe, die bei meter Breite auf pixel Bildpunkten nichts verschluckt"
+    pro_pixel = meter / max(pixel, 1)
+    return max([s for s in KARTENSTUFEN if s <= pro_pixel] or [1])
+
+
+class Kartenansicht:
+    """Höhen eines Kachelbestands in der passenden Stufe für einen Ausschnitt.
+
+    cache ist ein Kachelcache (ohne Cache wird für jede Kachel die ganze
+    XYZ-Datei gelesen). fertig(schluessel) wird im Ladethread aufgerufen,
+    sobald eine Kachel geladen ist; eine Oberfläche reicht das an ihren
+    eigenen Thread weiter, auch wenn das Laden fehlgeschlagen ist (siehe
+    fehler). Alle Koordinaten sind UTM-Meter mit
+    vorangestellter Zone wie in den XYZ-Dateien."""
+
+    def __init__(self, bestand, cache=None, max_bytes=KARTENSPEICHER,
+                 threads=LADETHREADS, fertig=None):
+        self.bestand = bestand
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.fertig = fertig
+        # (e, n, s) -> (x0, y0, hs), zuletzt benutzte am Ende
+        self.kacheln = OrderedDict()
+        self.belegt = 0
+        self.laufend = {}
+        # (e, n, s) -> Fehlermeldung
+        self.fehler = {}
+        self.sperre = threading.Lock()
+        self.pool = ThreadPoolExecutor(threads)
+
+    def grenzen(self):
+        "Südwest- und Nordostecke [m] aller Kacheln des Bestands"
+        es = [e for e, n in self.bestand.kacheln]
+        ns = [n for e, n in self.bestand.kacheln]
+        return (min(es)*1000, min(ns)*1000, max(es)*1000 + KACHELGROESSE,
+                max(ns)*1000 + KACHELGROESSE)
+
+    def schluessel(self, ul_e, ul_n, or_e, or_n, s):
+        "Vorhandene Kacheln im Ausschnitt als (e, n, s), von der Mitte aus"
+        es, ns = kachelbereich(int(ul_e), int(ul_n), int(or_e), int(or_n))
+        mitte_e, mitte_n = (ul_e+or_e) / 2000, (ul_n+or_n) / 2000
+        return sorted(((e, n, s) for e in es for n in ns
+                       if (e, n) in self.bestand.kacheln),
+                      key=lambda k: (k[0]+1-mitte_e)**2 + (k[1]+1-mitte_n)**2)
+
+    def anfordern(self, ul_e, ul_n, or_e, or_n, pixel):
+        """Lädt alle Kacheln, die der Ausschnitt bei pixel Bildpunkten
+        Breite braucht, im Hintergrund nach.
+
+        Noch nicht begonnene Aufträge für andere Ausschnitte werden
+        verworfen. Liefert die Stufe und die Schlüssel der Kacheln."""
+        s = kartenstufe(or_e-ul_e, pixel)
+        gebraucht = self.schluessel(ul_e, ul_n, or_e, or_n, s)
+        with self.sperre:
+            for k in set(self.laufend) - set(gebraucht):
+                if self.laufend[k].cancel():
+                    del self.laufend[k]
+            for k in gebraucht:
+                if k in self.kacheln:
+                    self.kacheln.move_to_end(k)
+                elif k not in self.laufend and k not in self.fehler:
+                    self.laufend[k] = self.pool.submit(self._lade, k)
+        return s, gebraucht
+
+    def geladen(self, schluessel):
+        "Wie viele der Kacheln schon geladen sind"
+        with self.sperre:
+            return sum(k in self.kacheln for k in schluessel)
+
+    def fehlerhaft(self, schluessel):
+        "Fehlermeldungen der Kacheln, die sich nicht laden ließen"
+        with self.sperre:
+            return {k: self.fehler[k] for k in schluessel if k in self.fehler}
+
+    def lade_stufe(self, pfad, s):
+        "Liefert (x0, y0, hs) der Stufe s einer Kachel"
+        if self.cache is not None:
+            basis = max(t for t in (1,) + STUFEN if s % t == 0)
+            x0, y0, hs, form = self.cache.lade_stufe(pfad, basis)
+        else:
+            basis = 1
+            x0, y0, hs = kachel_als_raster(pfad)
+        if s > basis:
+            hs = verkleinere(hs, s // basis)
+        return x0, y0, np.asarray(hs, np.float32)
+
+    def _lade(self, k):
+        e, n, s = k
+        name = KACHELNAME % (e, n)
+        try:
+            x0, y0, hs = self.lade_stufe(self.bestand.pfad(name), s)
+        except Exception as fehler:
+            # Im Threadpool ginge die Ausnahme verloren.
+            with self.sperre:
+                self.laufend.pop(k, None)
+                self.fehler[k] = "%s: %s" % (name, fehler)
+            if self.fertig is not None:
+                self.fertig(k)
+            return
+        with self.sperre:
+            self.laufend.pop(k, None)
+            self.kacheln[k] = (x0, y0, hs)
+            self.belegt += hs.nbytes
+            # Die am längsten nicht gebrauchten Kacheln verdrängen, die
+            # neue bleibt auf jeden Fall.
+            while self.belegt > self.max_bytes and len(self.kacheln) > 1:
+                alt_x0, alt_y0, alt = self.kacheln.popitem(last=False)[1]
+                self.belegt -= alt.nbytes
+        if self.fertig is not None:
+            self.fertig(k)
+
+    def bild(self, ul_e, ul_n, or_e, or_n, s):
+        """Höhenbild des Ausschnitts in Stufe s aus den geladenen Kacheln.
+
+        Liefert das Bild (Zeilen nach Norden, wie für imshow) und seine
+        Ausdehnung (links, rechts, unten, oben). Noch nicht geladene
+        Kacheln bleiben NaN."""
+        e0 = int(ul_e) - int(ul_e) % s
+        n0 = int(ul_n) - int(ul_n) % s
+        nx = int(or_e - e0) // s + 1
+        ny = int(or_n - n0) // s + 1
+        bild = np.full((ny, nx), np.nan, np.float32)
+        with self.sperre:
+            stuecke = [self.kacheln[k] for k in
+                       self.schluessel(ul_e, ul_n, or_e, or_n, s)
+                       if k in self.kacheln]
+        for x0, y0, hs in stuecke:
+            # Ab 64 m teilen die Blöcke 2000 m nicht mehr glatt; die
+            # Kachel wird dann auf den nächsten Bildpunkt gesetzt.
+            i = int(round((x0-e0) / s))
+            j = int(round((y0-n0) / s))
+            a, b = max(0, -i), max(0, -j)
+            ie, je = min(nx, i+hs.shape[0]), min(ny, j+hs.shape[1])
+            if i+a < ie and j+b < je:
+                bild[j+b:je, i+a:ie] = hs[a:ie-i, b:je-j].T
+        return bild, (e0 - s/2, e0 + (nx-1)*s + s/2,
+                      n0 - s/2, n0 + (ny-1)*s + s/2)
+
+    def schliesse(self):
+        "Beendet die Ladethreads, wartende Aufträge entfallen"
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Komprimierte Ausgabedateien, während des Schreibens gepackt.
+
+# ASCII-STL, DXF und die CAD-Skripte werden bei großen Modellen mehrere
+# Gigabyte groß und bestehen fast nur aus Ziffern; gepackt sind sie um ein
+# Vielfaches kleiner. Statt die fertige Datei hinterher zu packen, geht
+# der Text direkt in einen Kompressor, und auf die Platte kommt nur noch
+# die gepackte Datei.
+
+# Verfahren:
+#   gz   gzip (Standardbibliothek), Stufe 1 … 9, Standard 6
+#   xz   LZMA (Standardbibliothek), Stufe 0 … 9, Standard 6; langsam,
+#        aber am kleinsten
+#   zst  Zstandard, Stufe 1 … 22, Standard 3; nur mit compression.zstd
+#        (ab Python 3.14) oder dem Paket zstandard
+
+# Das Packen läuft in einem eigenen Thread: Die Schreibfunktion legt ihre
+# Textblöcke in eine kurze Warteschlange und formatiert schon den
+# nächsten Block, während der Thread packt und schreibt. zlib, lzma und
+# zstd geben dabei den GIL frei, beides läuft also wirklich gleichzeitig.
+# Die Warteschlange ist begrenzt, damit der Speicherbedarf nicht wächst,
+# wenn das Packen langsamer ist als das Formatieren.
+
+import gzip
+import io
+import lzma
+import queue
+import threading
+from collections import namedtuple
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+
+# verfahren: Name wie in VERFAHREN, stufe: Kompressionsstufe (None:
+# Standard des Verfahrens)
+Kompression = namedtuple("Kompression", "verfahren stufe")
+
+# Höchstens so viele Blöcke warten auf den Kompressor.
+WARTESCHLANGE = 4
+
+# Größe der Blöcke, die an den Kompressor gehen
+PUFFER = 1 << 20
+
+
+def _gzip(ausname, stufe):
+    # mtime=0: gleicher Inhalt, gleiche Datei
+    return gzip.GzipFile(ausname, "wb", 6 if stufe is None else stufe,
+                         mtime=0)
+
+
+def _xz(ausname, stufe):
+    return lzma.LZMAFile(ausname, "wb", preset=stufe)
+
+
+def _zst(ausname, stufe):
+    if zstd is not None:
+        return zstd.ZstdFile(ausname, "wb", level=stufe)
+    kompressor = zstandard.ZstdCompressor(3 if stufe is None else stufe)
+    return kompressor.stream_writer(open(ausname, "wb"), closefd=True)
+
+
+# Name -> (Dateiendung, Funktion zum Öffnen)
+VERFAHREN = {"gz": (".gz", _gzip),
+             "xz": (".xz", _xz)}
+if zstd is not None or zstandard is not None:
+    VERFAHREN["zst"] = (".zst", _zst)
+
+
+def kompression(text):
+    """Kompression aus einer Angabe wie "gz", "xz:9" oder "zst:19"
+
+    Für argparse; Fehler gibt es als ValueError."""
+    verfahren, _, stufe = text.partition(":")
+    if verfahren not in VERFAHREN:
+        raise ValueError("Unbekanntes Verfahren: %s (möglich: %s)" % (
+            verfahren, ", ".join(VERFAHREN)))
+    return Kompression(verfahren, int(stufe) if stufe else None)
+
+
+def endung(kompression):
+    "Zusätzliche Dateiendung (\"\" ohne Kompression)"
+    if kompression is None:
+        return ""
+    return VERFAHREN[kompression.verfahren][0]
+
+
+class _Hintergrundstrom(io.RawIOBase):
+    "Gibt alle geschriebenen Bytes in einem eigenen Thread an ziel weiter"
+
+    def __init__(self, ziel):
+        super().__init__()
+        self.ziel = ziel
+        self.schlange = queue.Queue(WARTESCHLANGE)
+        self.fehler = None
+        self.thread = threading.Thread(target=self._arbeite, daemon=True)
+        self.thread.start()
+
+    def writable(self):
+        return True
+
+    def write(self, daten):
+        if self.fehler is not None:
+            raise self.fehler
+        self.schlange.put(bytes(daten))
+        return len(daten)
+
+    def _arbeite(self):
+        while True:
+            daten = self.schlange.get()
+            if daten is None:
+                return
+            if self.fehler is None:
+                try:
+                    self.ziel.write(daten)
+                except BaseException as fehler:
+                    # Der Rest wird nur noch abgeholt, damit write()
+                    # nicht hängt; dort kommt der Fehler an.
+                    self.fehler = fehler
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            super().close()
+            self.schlange.put(None)
+            self.thread.join()
+        finally:
+            self.ziel.close()
+        if self.fehler is not None:
+            raise self.fehler
+
+
+def oeffne(ausname, modus="w", kompression=None):
+    """Öffnet eine Ausgabedatei wie open(ausname, modus)
+
+    Mit kompression wird alles, was in die Datei geschrieben wird, im
+    Hintergrund gepackt. ausname enthält dann schon die Endung des
+    Verfahrens."""
+    if kompression is None:
+        return open(ausname, modus)
+    packer = VERFAHREN[kompression.verfahren][1](ausname, kompression.stufe)
+    datei = io.BufferedWriter(_Hintergrundstrom(packer), PUFFER)
+    if "b" in modus:
+        return datei
+    return io.TextIOWrapper(datei)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# Umrechnung zwischen geographischen Koordinaten (WGS84) und UTM.
+
+# Beide Richtungen arbeiten mit NumPy auf ganzen Arrays; einzelne Zahlen
+# gehen natürlich auch. Die Hinrichtung ist genau die Reihenentwicklung,
+# die Gelaendemodell.py schon immer benutzt hat:
+#   http://www.ottmarlabonde.de/L1/UTMBeispielRechnung.htm
+#   Literatur: A. Schödlbauer,
+#       Rechenformeln und Rechenbeispiele zur Landesvermessung,
+#       Teil 2, Herbert WichmannVerlag Karlsruhe
+# Die Rückrichtung verwendet die entsprechenden Reihen über die
+# Fußpunktbreite und trifft die Hinrichtung auf weniger als einen
+# Millimeter.
+
+# Zonengrenzen: Jede Zone ist 6° breit, Zone 31 beginnt bei 0° Ost.
+# Ein Punkt genau auf einer Grenze (z. B. 12° Ost) gehört zur östlichen
+# Zone (hier 33). Mit Zone=… lassen sich alle Punkte in einer festen
+# Zone rechnen, auch über deren Grenze hinaus; so bleiben Rechtecke, die
+# eine Grenze überschreiten, zusammenhängend. Die NRW-Daten liegen alle
+# in Zone 32.
+
+import numpy as np
+
+# Halbachsen des WGS84-Ellipsoids:
+# a = 6378137.0
+# b = 6356752.314
+
+# Radiusreduzierung
+mH = 0.9996
+
+# c = a**2/b
+c = 6399593.626005325
+
+# eq = (a**2-b**2)/b**2
+eq = 0.006739496819936062
+
+# E0 = c*(1-3/4*eq+45/64*eq**2-175/256*eq**3+11025/16384*eq**4)
+E0 = 6367449.145759811
+
+# E2 = c*(-3/8*eq+15/32*eq**2-525/1024*eq**3+2205/4096*eq**4)
+E2 = -16038.508797800609
+
+# E4 = c*(15/256*eq**2-105/1024*eq**3+2205/16384*eq**4)
+E4 = 16.83262765753934
+
+# E6 = c*(-35/3072*eq**3+315/12288*eq**4)
+E6 = -0.021980907677118407
+
+# Koeffizienten für die Fußpunktbreite aus der Meridianbogenlänge,
+# mit n = (a-b)/(a+b):
+# F2 = 3/2*n - 27/32*n**3
+# F4 = 21/16*n**2 - 55/32*n**4
+# F6 = 151/96*n**3
+# F8 = 1097/512*n**4
+F2 = 0.0025188266133178887
+F4 = 3.700949120626813e-06
+F6 = 7.447814024105677e-09
+F8 = 1.7035994021191128e-11
+
+
+def zone(Lg):
+    "UTM-Zone zum Längengrad (Zonengrenzen gehören zur östlichen Zone)"
+    return 31 + np.floor(np.asarray(Lg, np.float64) / 6)
+
+
+def mittelmeridian(Zone):
+    "Längengrad des Mittelmeridians einer Zone"
+    return 6 * np.asarray(Zone, np.float64) - 183
+
+
+def utm(Bg, Lg, Zone=None):
+    """Umrechnung von Breitengrad und Längengrad in UTM-Koordinaten.
+
+    Bg und Lg sind Zahlen oder Arrays (Dezimalgrad). Liefert Nordwert,
+    Ostwert (ohne vorangestellte Zone) und Zonennummer. Ohne Zone wird
+    jeder Punkt in seiner eigenen Zone gerechnet."""
+    B = np.radians(Bg)
+    tB = np.tan(B)
+    cB = np.cos(B)
+
+    LL = E0*B + E2*np.sin(2*B) + E4*np.sin(4*B) + E6*np.sin(6*B)
+    x0 = mH*LL
+
+    if Zone is None:
+        Zone = zone(Lg)
+    Zone = np.asarray(Zone, np.float64)
+    DL = np.radians(Lg) - np.radians(mittelmeridian(Zone))
+
+    etaq = eq*cB**2
+    Nq = c/np.sqrt(1+etaq)
+
+    # Dieselben Reihen wie früher, nur mit einmal berechneten Quadraten
+    # und nach Horner ausgewertet (für große Arrays deutlich schneller).
+    cq = cB**2
+    tq = tB**2
+    DLq = DL**2
+
+    x2 = mH/2*Nq*tB*cq
+    x4 = x2/12*cq*(5-tq+9*etaq)
+    x6 = x2/360*cq**2*(61-58*tq+tq**2)
+
+    N = x0 + DLq*(x2 + DLq*(x4 + DLq*x6))
+
+    y1 = mH*Nq*cB
+    y3 = y1/6*cq*(1-tq+etaq)
+    y5 = y1/120*cq**2*(5-18*tq+tq**2+etaq*(14-58*tq))
+
+    E = DL*(y1 + DLq*(y3 + DLq*y5)) + 500000
+
+    return N, E, np.broadcast_to(Zone, np.shape(N))[()]
+
+
+def geo(N, E, Zone):
+    """Umrechnung von UTM-Koordinaten in Breitengrad und Längengrad.
+
+    E ist der Ostwert ohne vorangestellte Zone, Zone die Zonennummer
+    (Zahl oder Array). Liefert Breitengrad und Längengrad in Dezimalgrad.
+    Nur für die Nordhalbkugel."""
+    # Fußpunktbreite: Breite, deren Meridianbogen dem Nordwert entspricht
+    s = np.asarray(N, np.float64) / (mH*E0)
+    Bf = (s + F2*np.sin(2*s) + F4*np.sin(4*s) + F6*np.sin(6*s)
+          + F8*np.sin(8*s))
+    tf = np.tan(Bf)
+    cf = np.cos(Bf)
+    tq = tf**2
+    etaq = eq*cf**2
+    Nf = c/np.sqrt(1+etaq)
+    y = (np.asarray(E, np.float64) - 500000) / (mH*Nf)
+
+    B = Bf - tf/2*(1+etaq)*y**2 * (
+        1 - y**2/12*(5+3*tq+etaq-9*tq*etaq-4*etaq**2)
+        + y**4/360*(61+90*tq+45*tq**2+46*etaq-252*tq*etaq-90*tq**2*etaq))
+    DL = y/cf * (1 - y**2/6*(1+2*tq+etaq)
+                 + y**4/120*(5+28*tq+24*tq**2+6*etaq+8*tq*etaq))
+
+    return np.degrees(B), mittelmeridian(Zone) + np.degrees(DL)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+
+# Die Arbeitsschritte von Gelaendemodell.py als aufrufbare Funktionen.
+
+# Gelaendemodell.py lief früher auf Modulebene von oben nach unten durch,
+# mit input(), eval() und einem Tk-Dialog zwischen den Rechnungen. Hier
+# stehen dieselben Schritte ohne jede Rückfrage:
+#   rechteck()          Eckpunkte in Dezimalgrad -> UTM-Rechteck
+#   kacheln()           benötigte XYZ-Dateien im Kachelbestand suchen
+#   lade()              Höhenraster laden
+#   hoehenbereich()     Höhen und Unterkante des Modells
+#   baue_netz()         gemeinsames Dreiecksnetz aufbauen
+#   exportiere_modell() Ausgabedateien schreiben
+# erzeuge_modell() führt alle Schritte nacheinander aus. Wer viele Modelle
+# erzeugt, kann so in einem Prozess denselben Kachelbestand und denselben
+# Kachelcache weiterverwenden, statt jedes Mal neu zu starten.
+
+# Meldungen gehen wie bei lade_raster() und exportiere() an eine
+# Funktion log(s, sichtbar=True); protokoll() liefert die übliche, die
+# zusätzlich in die Log-Datei schreibt, melde() nur auf den Bildschirm.
+
+from collections import namedtuple
+from math import floor
+
+import numpy as np
+
+from Kacheln import lade_raster, Streifenraster
+from Koordinaten import utm
+from Kachelbestand import Kachelbestand, Katalog, KATALOG, kachelnamen
+from Dreiecksnetz import Dreiecksnetz, Streifennetz
+from Exporte import (FORMATE, braucht, ausgabeauftraege, exportiere,
+                     mesh_schritt)
+
+# Südwest- und Nordostecke in UTM-Koordinaten (Ostwert mit vorangestellter
+# Zone) und die Zone der Nordostecke
+Rechteck = namedtuple("Rechteck", "ul_e ul_n or_e or_n zone")
+
+
+class FehlendeDaten(Exception):
+    """Für das Rechteck fehlen Kacheln oder Höhenwerte.
+
+    kacheln sind die fehlenden XYZ-Dateien, archive die ZIP-Archive, in
+    denen sie laut Katalog zu finden sind."""
+
+    def __init__(self, meldung, kacheln=(), archive=()):
+        super().__init__(meldung)
+        self.kacheln = list(kacheln)
+        self.archive = list(archive)
+
+
+def melde(s, sichtbar=True):
+    "Bildschirmmeldung ohne Log-Datei"
+    if sichtbar:
+        print(f"\n{s}")
+
+
+def protokoll(name, bildschirm=True):
+    """Bildschirmmeldung mit Protokollierung in name.log
+
+    Mit bildschirm=False geht alles nur in die Log-Datei."""
+    def log(s, sichtbar=True):
+        with open(name+".log", "a") as logfile:
+            logfile.write(f"{s}\n")
+        if sichtbar and bildschirm:
+            print(f"\n{s}")
+    return log
+
+
+def koordinaten(text):
+    "Liest ein Koordinatenpaar wie 51.335757,7.479087 (Breite, Länge)"
+    teile = text.strip().strip("()").split(",")
+    if len(teile) != 2:
+        raise ValueError("Keine zwei mit einem Komma getrennten Zahlen: %r"
+                         % text)
+    return float(teile[0]), float(teile[1])
+
+
+def rechteck(lat1, lon1, lat2, lon2, log=melde):
+    "UTM-Rechteck zu zwei gegenüberliegenden Eckpunkten in Dezimalgrad"
+    # Die Eingabe war beliebig, wir brauchen aber die Südwestecke unten
+    # links und die Nordostecke oben rechts:
+    ul_lat = min(lat1, lat2)
+    ul_lon = min(lon1, lon2)
+    or_lat = max(lat1, lat2)
+    or_lon = max(lon1, lon2)
+    log(f"Geokoordinaten: {ul_lat},{ul_lon} {or_lat},{or_lon}",
+        sichtbar=False)
+
+    # Die Zonennummer ist in den Dateien, die unter opengeodata.nrw.de
+    # heruntergeladen werden können, dem Ostwert vorangestellt. Der
+    # Nordwert wird übernommen.
+    n, e, zn = utm(ul_lat, ul_lon)
+    ul_e = int("%i%i" % (zn, e))
+    ul_n = int(n)
+    n, e, zn = utm(or_lat, or_lon)
+    or_e = int("%i%i" % (zn, e))
+    or_n = int(n)
+
+    log("\nLage und Größe des ausgewählten Rechtecks:")
+    log("UTM-Koordinaten: %i,%i %i,%i in Zone %i"
+        % (ul_e, ul_n, or_e, or_n, zn))
+    log("Ausdehnung Ost-West: %i m" % (or_e-ul_e))
+    log("Ausdehnung Nord-Süd: %i m" % (or_n-ul_n))
+    log("Fläche: %i m²" % ((or_e-ul_e)*(or_n-ul_n)))
+    return Rechteck(ul_e, ul_n, or_e, or_n, int(zn))
+
+
+def kacheln(bestand, r):
+    """Pfade der XYZ-Dateien für das Rechteck r.
+
+    bestand ist ein Kachelbestand oder der Name des Datenordners. Fehlt
+    eine Kachel, gibt es FehlendeDaten mit den Archiven aus dem Katalog."""
+    if not isinstance(bestand, Kachelbestand):
+        bestand = Kachelbestand(bestand, Katalog(KATALOG))
+    fehlende = bestand.fehlende(*r[:4])
+    if fehlende:
+        raise FehlendeDaten("Es fehlen %i XYZ-Dateien." % len(fehlende),
+                            fehlende, bestand.fehlende_archive(*r[:4]))
+    return [bestand.pfad(xyz_name) for xyz_name in kachelnamen(*r[:4])]
+
+
+def vorschlag(r):
+    "Punktabstand für etwa 1000 Punkte im Rechteck und deren Anzahl"
+    kl0 = max(1, int(((r.or_e-r.ul_e)*(r.or_n-r.ul_n)/1000)**0.5))
+    p0 = ((r.or_e-r.ul_e)//kl0) * ((r.or_n-r.ul_n)//kl0)
+    return kl0, p0
+
+
+def an_stufe(r, s, kl, log=melde):
+    """Rechteck r, dessen Südwestecke auf ein Vielfaches der
+    Pyramidenstufe s verschoben ist.
+
+    Passt keine Stufe (s = 1) oder wird das Rechteck dafür zu klein,
+    bleibt es, wie es ist, und es gilt die volle Auflösung."""
+    ul_e = r.ul_e + -r.ul_e % s
+    ul_n = r.ul_n + -r.ul_n % s
+    if s == 1 or ul_e > r.or_e or ul_n > r.or_n:
+        log("Keine Pyramidenstufe für %i m Punktabstand, verwende die "
+            "volle Auflösung" % kl)
+        return r
+    if (ul_e, ul_n) != (r.ul_e, r.ul_n):
+        log("Südwestecke für die Pyramidenstufe um %i m nach Osten und "
+            "%i m nach Norden verschoben: %i,%i"
+            % (ul_e-r.ul_e, ul_n-r.ul_n, ul_e, ul_n))
+    log("Verwende geglättete Höhen: Mittel über %i×%i Punkte aus dem "
+        "Kachelcache" % (s, s))
+    return r._replace(ul_e=ul_e, ul_n=ul_n)
+
+
+def lade(pfade, r, kl=1, kh=1, cache=None, index=False, prozesse=1,
+         kontext=None, streifen=False, log=melde):
+    """Höhenraster des Rechtecks r mit Punktabstand kl [m] und auf kh [cm]
+    gerundeten Höhen. Fehlen Höhenwerte, gibt es FehlendeDaten.
+
+    Mit streifen wird ein Streifenraster geliefert, das die Höhen erst
+    beim Schreiben Streifen für Streifen lädt (für Gebiete, die nicht in
+    den Speicher passen). Vorab wird es einmal ganz durchlaufen, um
+    fehlende Punkte und den Höhenbereich zu bestimmen.
+
+    Mit der Pyramide des Kachelcaches wird die Südwestecke auf ein
+    Vielfaches der Stufe nach Nordosten verschoben, damit jeder
+    Rasterpunkt auf eine Blockecke fällt (siehe Kacheln.stufe_passt())."""
+    if cache is not None and cache.pyramide:
+        r = an_stufe(r, cache.stufe(kl), kl, log)
+
+    xmax = r.or_e - (r.or_e-r.ul_e) % kl
+    ymax = r.or_n - (r.or_n-r.ul_n) % kl
+
+    log("Horizontale Auflösung [m]: %i" % kl, sichtbar=False)
+    log("Vertikale Auflösung [cm]: %i" % kh, sichtbar=False)
+    log("\nAbstand der neuen Punkte: %i m" % kl)
+    log("\nAusdehnung Ost-West: %i m" % (xmax-r.ul_e))
+    log("Ausdehnung Nord-Süd: %i m" % (ymax-r.ul_n))
+    fqm = (xmax-r.ul_e)*(ymax-r.ul_n)
+    log("Fläche: %i m² bzw. %.3f km²" % (fqm, fqm/1e6))
+
+    if streifen:
+        raster = Streifenraster(pfade, r.ul_e, r.ul_n, r.or_e, r.or_n, kl,
+                                kh, cache=cache, index=index)
+        log("Lese %i XYZ-Dateien in Streifen zu %i Rasterzeilen" % (
+            len(pfade), raster.breite))
+    else:
+        # Ausschnitt, Ausdünnung und Rundung erledigt lade_raster() mit
+        # NumPy für große Blöcke der Dateien auf einmal.
+        raster = lade_raster(pfade, r.ul_e, r.ul_n, r.or_e, r.or_n, kl, kh,
+                             cache=cache, index=index, prozesse=prozesse,
+                             kontext=kontext, log=log)
+    fehlend = raster.fehlend()
+    if fehlend:
+        raise FehlendeDaten(f"Für {fehlend} Punkte des Rechtecks wurden "
+                            "keine Höhenwerte gefunden.")
+    return raster
+
+
+def hoehenbereich(raster, log=melde):
+    """Unterkante, größte und kleinste Höhe des Modells.
+
+    Die Unterseite liegt nicht auf null, sondern knapp unter dem
+    tatsächlichen Gelände."""
+    minhs = raster.minh()
+    maxh = raster.maxh()
+    log(f"Größte gefundene Höhe: {maxh:.2f} Meter")
+    log(f"Kleinste gefundene Höhe: {minhs:.2f} Meter")
+    minh = 10 * floor(minhs/10) - 10
+    log(f"Setze Unterkante auf {minh:.2f} Meter.")
+    log(f"Neue Modellhöhe: {maxh-minh:.2f} Meter")
+    return minh, maxh, minhs
+
+
+def baue_netz(raster, minh, formate, max_fehler=None, log=melde):
+    """Das geschlossene Dreiecksnetz für DXF, 3D-Flächen und STL, oder
+    None, wenn keines der Formate es braucht.
+
+    Mit max_fehler wird die Oberfläche adaptiv trianguliert. Zu einem
+    Streifenraster gehört ein Streifennetz, das erst beim Schreiben
+    entsteht; adaptiv geht das nicht."""
+    if not braucht(formate, "netz"):
+        return None
+    if isinstance(raster, Streifenraster):
+        if max_fehler is not None:
+            raise ValueError("Ein adaptives Dreiecksnetz geht nicht "
+                             "streifenweise.")
+        netz = Streifennetz(raster, minh)
+        log("Dreiecksnetz mit %i Dreiecken, streifenweise" % len(netz))
+        return netz
+    if max_fehler is not None:
+        log("Adaptives Dreiecksnetz mit höchstens %.2f m Abweichung"
+            % max_fehler)
+    netz = Dreiecksnetz.aus_raster(raster, minh, max_fehler)
+    log("Dreiecksnetz mit %i Punkten und %i Dreiecken" % (
+        len(netz.punkte), len(netz)))
+    return netz
+
+
+def exportiere_modell(name, formate, raster, netz, minh, maxh, prozesse=1,
+                      kontext=None, kompression=None, log=melde):
+    """Schreibt die ausgewählten Ausgabedateien name.*
+
+    kompression (siehe Kompression.py) packt die Textformate."""
+    if FORMATE["mesh"] in formate:
+        n = mesh_schritt(raster)
+        if n > 1:
+            log("Verwende im 3D-Netz (Mesh) nur jeden %i. Punkt pro "
+                "Richtung." % n)
+    # Die Ausgabedateien sind voneinander unabhängig und werden mit
+    # mehreren Prozessen gleichzeitig geschrieben.
+    exportiere(ausgabeauftraege(name, formate, kompression, raster=raster,
+                                netz=netz, minh=minh, maxh=maxh),
+               prozesse=prozesse, kontext=kontext, log=log)
+
+
+# Das Diagramm ist eine Vorschau: Mehr Punkte als Bildschirmpixel bringen
+# nichts, kosten aber beim Zeichnen und im PDF (früher eine Vektorfläche
+# pro Rasterzelle) Minuten und viele MB. Deshalb wird nur jeder n-te
+# Punkt pro Richtung verwendet, sodass höchstens VORSCHAUPUNKTE pro Seite
+# übrig bleiben. Der Aufwand hängt damit nicht mehr von der Größe des
+# Modells ab.
+VORSCHAUPUNKTE = 1000
+
+
+def vorschau(raster, punkte=VORSCHAUPUNKTE):
+    """Ausgedünntes Höhenraster für das Diagramm.
+
+    Liefert die x- und y-Werte relativ zur Südwestecke, die Höhenmatrix
+    für Matplotlib (Zeilen nach Norden) und den Punktabstand [m]."""
+    n = -(-max(raster.nx, raster.ny) // punkte)
+    zi = raster.ausgeduennt(n).T
+    d = n * raster.kl
+    return (np.arange(zi.shape[1]) * d, np.arange(zi.shape[0]) * d, zi, d)
+
+
+def diagramm(name, raster, r, minhs, maxh, titel, zeigen=False, log=melde):
+    """Höhendiagramm mit Matplotlib, als name.pdf gespeichert.
+
+    Liefert das pyplot-Modul (zum späteren Schließen des Fensters) oder
+    None, wenn kein Diagramm erzeugt werden konnte."""
+    try:
+        import matplotlib.pyplot as plt
+
+        # Keine Interaktion, Diagramm nur anzeigen …
+        plt.rcParams['toolbar'] = 'None'
+        fig, ax = plt.subplots()
+        # Einheitlicher Maßstab für x und y
+        ax.set_aspect('equal')
+
+        # Für das Diagramm wird die untere linke Ecke auf (0,0)
+        # gesetzt. Wer kann schon was mit UTM-Koordinaten anfangen?
+        xi, yi, zi, d = vorschau(raster)
+
+        # Anzahl der Höhenlinien: etwa 10 (7 bis 14)
+        nh = (maxh-minhs) * 100
+        while nh > 70: nh = int(nh/10)
+        if nh > 35: nh = int(nh/5)
+        if nh > 14: nh = int(nh/2)
+
+        # farbige Oberfläche als Bild, die Pixel mittig auf den Punkten
+        bild = ax.imshow(zi, cmap=plt.get_cmap('terrain'), origin='lower',
+                         extent=(-d/2, xi[-1]+d/2, -d/2, yi[-1]+d/2),
+                         interpolation='nearest')
+        # im PDF als Rasterbild statt als einzelne Flächen
+        bild.set_rasterized(True)
+        # Höhenlinien auf demselben Raster
+        ax.contour(xi, yi, zi, nh, linewidths=1, colors="k")
+        # Legende
+        fig.colorbar(bild)
+        # Überschrift
+        ax.set_title(titel)
+        if fig.canvas.manager is not None:
+            fig.canvas.manager.set_window_title(f'Höhendiagramm {name}')
+        if zeigen:
+            # anzeigen und zurück zum Programm …
+            plt.show(block=False)
+        # Bild als PDF speichern
+        ausname = name+".pdf"
+        log("Schreibe PDF-Ausgabedatei: %s" % ausname)
+        fig.savefig(ausname, bbox_inches='tight')
+        return plt
+
+    except:
+        print("\nFehler: Diagramm kann nicht angezeigt werden."
+              " Ist matplotlib nicht installiert?\n")
+        return None
+
+
+def erzeuge_modell(name, ecken, bestand, kl=1, kh=1, formate=None,
+                   max_fehler=None, cache=None, index=False, prozesse=1,
+                   exportprozesse=1, kontext=None, streifen=False,
+                   kompression=None, log=None):
+    """Alle Schritte für ein Modell ohne Rückfragen.
+
+    ecken sind zwei gegenüberliegende Eckpunkte (Breite, Länge) in
+    Dezimalgrad, formate die Ausgabeformate (Standard: alle). Liefert
+    das Rechteck und das Höhenraster."""
+    if log is None:
+        log = protokoll(name)
+    if formate is None:
+        formate = list(FORMATE.values())
+    (lat1, lon1), (lat2, lon2) = ecken
+    r = rechteck(lat1, lon1, lat2, lon2, log=log)
+    pfade = kacheln(bestand, r)
+    raster = lade(pfade, r, kl, kh, cache=cache, index=index,
+                  prozesse=prozesse, kontext=kontext, streifen=streifen,
+                  log=log)
+    minh, maxh, minhs = hoehenbereich(raster, log=log)
+    netz = baue_netz(raster, minh, formate, max_fehler, log=log)
+    exportiere_modell(name, formate, raster, netz, minh, maxh,
+                      prozesse=exportprozesse, kontext=kontext,
+                      kompression=kompression, log=log)
+    return r, raster
@@ -1,17 +1,28 @@
 import tkinter as tk
 import tkinter.messagebox
+import tkinter.filedialog
 import customtkinter
-import csv
+import os
+import queue
 import threading
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
+from Kacheln import Kachelcache, lies_bloecke
+from Kachelbestand import Kachelbestand
+from Kartenansicht import Kartenansicht, KARTENCACHE
+from Einstellungen import CACHE_ORDNER, CACHE_GROESSE
+from Exportauftraege import Auftragsverwaltung, ecken_um, LAEUFT
 
 customtkinter.set_appearance_mode("System")  
 customtkinter.set_default_color_theme("blue")
 scmap = plt.cm.gist_earth
 MPLBACKEND = FigureCanvasTkAgg
+POLL_INTERVAL = 50          # ms between two looks into the worker queue
+GEO_DATA = "osm/geo_data.txt"
+READ_BLOCK = 1 << 22        # bytes parsed at once, also the progress step
+MAP_ZOOM = 1.25             # zoom factor per mouse wheel step in the map
 
 # GUI
 class App(customtkinter.CTk):
@@ -48,11 +59,11 @@ class App(customtkinter.CTk):
         # Main coordinate Selection Window, values are stored in self.entry_values
         self.selection_frame = customtkinter.CTkFrame(self)
         self.selection_frame.grid(row=0, column=1, rowspan=3, padx=20, pady=(20, 10), sticky="nsew")
-        self.selection_frame.grid_rowconfigure(7, weight=1)
         self.selection_frame.grid_columnconfigure(1, weight=1)
 
-        self.labels = ["Longitude", "Latidude", "Radius"]
-        self.entrys_placehoder = ["Entry Longitude", "Entry Latitude", "Entry Radius"]
+        self.labels = ["Longitude", "Latidude", "Radius", "Resolution", "Height step"]
+        self.entrys_placehoder = ["Entry Longitude", "Entry Latitude", "Entry Radius [m]",
+                                  "kl [m], default 1", "kh [cm], default 1"]
         self.entry_values = []
         self.results = zip(self.labels, self.entrys_placehoder)
         
@@ -67,7 +78,8 @@ class App(customtkinter.CTk):
             self.counter += 1
         
         self.apply_butoon = customtkinter.CTkButton(self.selection_frame, text="Apply", command=self.read_initial_cords)
-        self.apply_butoon.grid(row=7, column=1, padx=(20,20), pady=(5,10), sticky="sew")
+        self.apply_butoon.grid(row=self.counter, column=1, padx=(20,20), pady=(5,10), sticky="sew")
+        self.selection_frame.grid_rowconfigure(self.counter, weight=1)
 
 
         # Frame for selecting additional coordinates, stored in self.additional_latidude_values / self.additional_longitude_values
@@ -99,6 +111,10 @@ class App(customtkinter.CTk):
         self.progress_label.grid(row=0, column=1, pady=10, sticky="ew")
         self.progressbar = customtkinter.CTkProgressBar(self.status_frame, mode="intermidiate")
         self.progressbar.grid(row=1, column=0, columnspan=2, padx=(20, 20), pady=(10, 20), sticky="sew")
+        self.job_menu = customtkinter.CTkOptionMenu(self.status_frame, values=["No jobs"])
+        self.job_menu.grid(row=2, column=0, padx=(20, 5), pady=(0, 20), sticky="sew")
+        self.cancel_button = customtkinter.CTkButton(self.status_frame, text="Cancel job", command=self.cancel_job)
+        self.cancel_button.grid(row=2, column=1, padx=(5, 20), pady=(0, 20), sticky="sew")
 
 
         # Plot Window to create a matplotlib plot
@@ -107,7 +123,10 @@ class App(customtkinter.CTk):
         self.image_frame.grid_rowconfigure(4, weight=1)
         self.image_frame.grid_columnconfigure(0, weight=1)
         self.plot_button = customtkinter.CTkButton(self.image_frame, text="Plot", command=self.plot_entry)
-        self.plot_button.grid(row=0, column=0, padx=20, pady=(20, 10))
+        self.plot_button.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="w")
+        self.map_button = customtkinter.CTkButton(self.image_frame, text="Map", command=self.open_map)
+        self.map_button.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="e")
+        self.create_plot()
 
         
         # Values to initialize by laoding the Window
@@ -118,15 +137,242 @@ class App(customtkinter.CTk):
         self.additional_latidude_values = []
         self.additional_longitude_values = []
 
+        # Loading runs in a worker thread, results come back through this queue
+        self.plot_queue = queue.Queue()
+        self.plot_thread = None
+
+        # Map over a whole DGM folder (see Kartenansicht.py), loaded tiles arrive through this queue
+        self.map_view = None
+        self.map_queue = queue.Queue()
+        self.map_poll = None
+        self.map_drag = None
+        self.map_level = 1
+        self.map_tiles = []
+
+        # Terrain exports (see Exportauftraege.py), each in its own process so it can be cancelled.
+        # Spawned, not forked: a fork would copy Tk and the map loader thread into the job
+        self.jobs = Auftragsverwaltung("spawn")
+        self.job_poll = None
+        self.dgm_folder = None
+
 
     # Functions
-    # Example plot function with random heatmap 
-    def plot_entry(self):
-        fig = plot_xyz_cords()
-        self.canvas= FigureCanvasTkAgg(fig, master=self.image_frame)
+    # One figure, canvas and set of artists for the whole session, new data only updates them
+    # Image and contours are animated: a full draw leaves them out and keeps the rest as
+    # background, so new data is drawn with blitting
+    def create_plot(self):
+        self.figure = Figure(figsize=(4,4), dpi = 100, facecolor="#2A68A3")
+        self.plot_axes = self.figure.add_subplot(111)
+        self.plot_image = self.plot_axes.imshow(np.zeros((2, 2)), cmap = scmap, interpolation = 'gaussian',
+                    origin='lower', aspect='equal', animated=True)
+        self.plot_contour = None
+        self.plot_axes.set_title("Topography Sample", fontsize=15)
+        self.plot_axes.set_xlabel("X", fontsize=10)
+        self.plot_axes.set_ylabel("Y", fontsize=10)
+        self.figure.colorbar(self.plot_image)        # Adding CB
+        self.figure.autofmt_xdate(rotation=45)       # rotate x labels
+        self.plot_limits = None
+        self.plot_background = None
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.image_frame)
+        self.canvas.mpl_connect("draw_event", self.on_plot_draw)
+        self.canvas.mpl_connect("scroll_event", self.on_map_scroll)
+        self.canvas.mpl_connect("button_press_event", self.on_map_press)
+        self.canvas.mpl_connect("motion_notify_event", self.on_map_drag)
+        self.canvas.mpl_connect("button_release_event", self.on_map_release)
         self.canvas.get_tk_widget().grid(row=1, rowspan=3, column=0, padx=20, pady=10)
 
 
+    # After every full draw (also on resize): keep the background, add the animated artists
+    def on_plot_draw(self, event):
+        self.plot_background = self.canvas.copy_from_bbox(self.plot_axes.bbox)
+        self.draw_plot_artists()
+
+
+    def draw_plot_artists(self):
+        self.plot_axes.draw_artist(self.plot_image)
+        if self.plot_contour is not None:
+            self.plot_axes.draw_artist(self.plot_contour)
+
+
+    # Show new data in the existing artists
+    def update_plot(self, x, y, Z):
+        extent = (x[0], x[-1], y[0], y[-1])
+        limits = (extent, (np.nanmin(Z), np.nanmax(Z)))
+        self.plot_image.set_data(Z)
+        if self.plot_contour is not None:
+            self.plot_contour.remove()
+        self.plot_contour = self.plot_axes.contour(x, y, Z, 7, linewidths = 0.5, colors = 'k')
+        self.plot_contour.set_animated(True)
+        if limits != self.plot_limits or self.plot_background is None:
+            # Axes and colorbar change, the background has to be drawn again
+            self.plot_limits = limits
+            self.plot_image.set_extent(extent)
+            self.plot_axes.set_xlim(extent[:2])
+            self.plot_axes.set_ylim(extent[2:])
+            self.plot_image.set_clim(*limits[1])
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.plot_background)
+            self.draw_plot_artists()
+            self.canvas.blit(self.plot_axes.bbox)
+
+
+    # Open a folder with DGM tiles as a map: drag to pan, mouse wheel to zoom
+    # Only the tiles in view are loaded, at the level of detail the zoom needs
+    def open_map(self):
+        folder = tkinter.filedialog.askdirectory(title="Folder with DGM tiles")
+        if not folder:
+            return
+        self.dgm_folder = folder
+        bestand = Kachelbestand(folder)
+        if not len(bestand):
+            self.progress_label.configure(text="No DGM tiles in this folder")
+            return
+        self.close_map()
+        # Only the preview levels are cached, in a cache folder instead of next to the tiles
+        cache = Kachelcache(CACHE_ORDNER or KARTENCACHE, CACHE_GROESSE, pyramide=True, voll=False)
+        self.map_view = Kartenansicht(bestand, cache, fertig=self.map_queue.put)
+        if self.plot_contour is not None:
+            self.plot_contour.remove()
+            self.plot_contour = None
+        self.plot_limits = None     # the next file plot draws everything again
+        ul_e, ul_n, or_e, or_n = self.map_view.grenzen()
+        self.plot_axes.set_xlim(ul_e, or_e)
+        self.plot_axes.set_ylim(ul_n, or_n)
+        self.update_map()
+        self.map_poll = self.after(POLL_INTERVAL, self.poll_map_queue)
+
+
+    def close_map(self):
+        if self.map_view is not None:
+            self.map_view.schliesse()
+            self.map_view = None
+        if self.map_poll is not None:
+            self.after_cancel(self.map_poll)
+            self.map_poll = None
+        self.map_drag = None
+
+
+    # Request the tiles of the current viewport and show those loaded already
+    def update_map(self):
+        (ul_e, or_e), (ul_n, or_n) = self.plot_axes.get_xlim(), self.plot_axes.get_ylim()
+        self.map_level, self.map_tiles = self.map_view.anfordern(ul_e, ul_n, or_e, or_n,
+                                                                 self.plot_axes.bbox.width)
+        self.draw_map()
+
+
+    def draw_map(self):
+        xlim, ylim = self.plot_axes.get_xlim(), self.plot_axes.get_ylim()
+        image, extent = self.map_view.bild(xlim[0], ylim[0], xlim[1], ylim[1], self.map_level)
+        self.plot_image.set_data(image)
+        self.plot_image.set_extent(extent)
+        # set_extent would zoom to the whole image
+        self.plot_axes.set_xlim(xlim)
+        self.plot_axes.set_ylim(ylim)
+        if not np.isnan(image).all():
+            self.plot_image.set_clim(np.nanmin(image), np.nanmax(image))
+        loaded = self.map_view.geladen(self.map_tiles)
+        failed = self.map_view.fehlerhaft(self.map_tiles)
+        self.progressbar.set((loaded + len(failed)) / len(self.map_tiles) if self.map_tiles else 1)
+        text = "Map: %i/%i tiles at %i m" % (loaded, len(self.map_tiles), self.map_level)
+        if failed:
+            text += ", %i failed (%s)" % (len(failed), next(iter(failed.values())))
+        self.progress_label.configure(text=text)
+        self.canvas.draw_idle()
+
+
+    # Runs in the mainloop: redraw when tiles of the current view have arrived
+    def poll_map_queue(self):
+        arrived = False
+        while True:
+            try:
+                arrived = self.map_queue.get_nowait() in self.map_tiles or arrived
+            except queue.Empty:
+                break
+        if arrived:
+            self.draw_map()
+        self.map_poll = self.after(POLL_INTERVAL, self.poll_map_queue)
+
+
+    def on_map_scroll(self, event):
+        if self.map_view is None or event.inaxes is not self.plot_axes:
+            return
+        factor = 1 / MAP_ZOOM if event.button == "up" else MAP_ZOOM
+        low, high = self.plot_axes.get_xlim()
+        self.plot_axes.set_xlim(event.xdata + (low-event.xdata)*factor, event.xdata + (high-event.xdata)*factor)
+        low, high = self.plot_axes.get_ylim()
+        self.plot_axes.set_ylim(event.ydata + (low-event.ydata)*factor, event.ydata + (high-event.ydata)*factor)
+        self.update_map()
+
+
+    def on_map_press(self, event):
+        if self.map_view is None or event.button != 1 or event.inaxes is not self.plot_axes:
+            return
+        self.map_drag = (event.x, event.y, self.plot_axes.get_xlim(), self.plot_axes.get_ylim())
+
+
+    def on_map_drag(self, event):
+        if self.map_drag is None:
+            return
+        x, y, xlim, ylim = self.map_drag
+        dx = (event.x - x) * (xlim[1] - xlim[0]) / self.plot_axes.bbox.width
+        dy = (event.y - y) * (ylim[1] - ylim[0]) / self.plot_axes.bbox.height
+        self.plot_axes.set_xlim(xlim[0] - dx, xlim[1] - dx)
+        self.plot_axes.set_ylim(ylim[0] - dy, ylim[1] - dy)
+        self.update_map()
+
+
+    def on_map_release(self, event):
+        self.map_drag = None
+
+
+    # Load the data in a worker thread, the mainloop keeps running meanwhile
+    def plot_entry(self):
+        if self.plot_thread is not None and self.plot_thread.is_alive():
+            return
+        self.close_map()
+        self.plot_button.configure(state="disabled")
+        self.progressbar.set(0)
+        self.progress_label.configure(text="Loading data")
+        self.plot_thread = threading.Thread(target=self.plot_worker, daemon=True)
+        self.plot_thread.start()
+        self.after(POLL_INTERVAL, self.poll_plot_queue)
+
+
+    # Runs in the worker thread: no tk or matplotlib calls in here
+    def plot_worker(self):
+        def progress(value, text):
+            self.plot_queue.put(("progress", value, text))
+        try:
+            self.plot_queue.put(("done", load_xyz_grid(progress)))
+        except Exception as error:
+            self.plot_queue.put(("error", error))
+
+
+    # Runs in the mainloop: show progress and draw the finished data
+    def poll_plot_queue(self):
+        while True:
+            try:
+                message = self.plot_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                self.progressbar.set(message[1])
+                self.progress_label.configure(text=message[2])
+                continue
+            self.plot_button.configure(state="normal")
+            if message[0] == "error":
+                self.progress_label.configure(text="Loading failed")
+                tkinter.messagebox.showerror("Plot", str(message[1]))
+                return
+            # matplotlib only on the main thread
+            self.update_plot(*message[1])
+            self.progressbar.set(1)
+            self.progress_label.configure(text="Plot finished")
+            return
+        self.after(POLL_INTERVAL, self.poll_plot_queue)
+
+
     # Change the appearance from the GUI
     def change_appearance_mode_event(self, new_appearance_mode: str):
         customtkinter.set_appearance_mode(new_appearance_mode)
@@ -138,11 +384,71 @@ class App(customtkinter.CTk):
         customtkinter.set_widget_scaling(new_scaling_float)
 
 
-    # Return the main coordinate Values
+    # Start a terrain export for the square around the main coordinates
+    # Output files are named after the job number, centre and radius, all formats are written
     def read_initial_cords(self):
-        for entry in zip(self.entry_values, self.labels):
-            value = float(entry[0].get())
-            print(value, entry[1])
+        try:
+            values = [float(entry.get() or 1) if label in ("Resolution", "Height step") else float(entry.get())
+                      for entry, label in zip(self.entry_values, self.labels)]
+        except ValueError:
+            self.progress_label.configure(text="Please enter numbers")
+            return
+        longitude, latitude, radius, kl, kh = values
+        if radius <= 0 or kl < 1 or kh < 1:
+            self.progress_label.configure(text="Radius, kl and kh must be positive")
+            return
+        if self.dgm_folder is None:
+            self.dgm_folder = tkinter.filedialog.askdirectory(title="Folder with DGM tiles") or None
+            if self.dgm_folder is None:
+                return
+        name = "dgm%i_%.5f_%.5f_%gm" % (self.jobs.naechste, latitude, longitude, radius)
+        try:
+            job = self.jobs.starte(name, ecken_um(latitude, longitude, radius), self.dgm_folder, int(kl), int(kh))
+        except ValueError as error:
+            self.progress_label.configure(text=str(error))
+            return
+        self.update_job_menu()
+        self.job_menu.set(self.job_title(job))
+        if self.job_poll is None:
+            self.job_poll = self.after(POLL_INTERVAL, self.poll_jobs)
+
+
+    def job_title(self, job):
+        return "%i: %s" % (job.nummer, job.name)
+
+
+    def update_job_menu(self):
+        titles = [self.job_title(job) for job in self.jobs.laufend()]
+        self.job_menu.configure(values=titles or ["No jobs"])
+        if self.job_menu.get() not in titles:
+            self.job_menu.set(titles[-1] if titles else "No jobs")
+
+
+    # Cancel the job selected in the menu, also in the middle of loading or writing
+    def cancel_job(self):
+        number = self.job_menu.get().split(":")[0]
+        if number.isdigit():
+            self.jobs.abbrechen(int(number))
+            self.progress_label.configure(text="Cancelled " + self.job_menu.get())
+            self.update_job_menu()
+
+
+    # Runs in the mainloop: stage progress of the running jobs into the progress bar
+    def poll_jobs(self):
+        for job in self.jobs.abfragen():
+            if job.zustand != LAEUFT:
+                self.progress_label.configure(text="%s: %s" % (job.name, job.text))
+                self.update_job_menu()
+        # Cancelled jobs are cleaned up in later polls, so keep polling until all are gone
+        if not self.jobs.offen():
+            self.job_poll = None
+            return
+        running = self.jobs.laufend()
+        if running:
+            self.progressbar.set(sum(job.anteil for job in running) / len(running))
+            newest = running[-1]
+            self.progress_label.configure(text="%i job(s) running, %s: %s" % (len(running), newest.name, newest.text))
+        self.job_poll = self.after(POLL_INTERVAL, self.poll_jobs)
 
 
     # Add and remove additional entry fields
@@ -187,41 +493,57 @@ if __name__ == "__main__":
 
 # LOGICAL FUNCTIONS
 #-----------------------------------------------------------------------
+# Parsed files and their grids, keyed on (path, mtime)
+# Repeat plots of unchanged data need no file I/O, a changed file is read again
+    xyz_cache = {}
+    xyz_cache_lock = threading.Lock()
+
+    def cached_entry(path):
+        key = (path, os.stat(path).st_mtime_ns)
+        with xyz_cache_lock:
+            if key not in xyz_cache:
+                # Older versions of the same file are of no use anymore
+                for old in [k for k in xyz_cache if k[0] == path]:
+                    del xyz_cache[old]
+                xyz_cache[key] = {}
+            return xyz_cache[key]
+
 # Extract Cords from a given File - Later file from cord selection
-    def extract_xyz_cords():
-        csvData = []
-        with open("osm/geo_data.txt", "r") as csvFile:
-            csvReader = csv.reader(csvFile, delimiter=" ")
-            for csvRow in csvReader:
-                csvData.append(csvRow[0:3])
-        csvData = np.asarray(csvData)
-        csvData = csvData.astype(np.float_)
-        x, y, z = csvData[:,0], csvData[:,1], csvData[:,2]
-        return x, y, z
-
-# Create the topography map 
-    def plot_xyz_cords():
-        x,y,z = extract_xyz_cords()
-        x=np.unique(x)
-        y=np.unique(y)
-        X,Y = np.meshgrid(x,y)
-        Z=z.reshape(len(x),len(y))
-        Z=np.transpose(Z)
-        data = Z  
-        fig = plt.figure(figsize=(4,4), dpi = 100, facecolor="#2A68A3")
-        ax = fig.add_subplot(111)
-        ax.contour(X, Y, Z, 7, linewidths = 0.5, colors = 'k')
-        im = ax.imshow(data, cmap = scmap, interpolation = 'gaussian', origin='lower',\
-                    aspect='equal',  extent = [min(x), max(x), min(y), max(y)] ) 
-        ax.set_title("Topography Sample", fontsize=15)
-        ax.set_xlabel("X", fontsize=10)
-        ax.set_ylabel("Y", fontsize=10)
-        fig.colorbar(im)                    # Adding CB
-        fig.autofmt_xdate(rotation=45)      # rotate x labels
-        return fig
+# Parsed blockwise with NumPy, progress(value, text) gets the read share of
+# the file (0 ... 0.8)
+    def extract_xyz_cords(progress=lambda value, text: None, path=GEO_DATA):
+        entry = cached_entry(path)
+        if "xyz" not in entry:
+            size = max(os.path.getsize(path), 1)
+            blocks = []
+            # Only the first three columns count, a bad line raises an error naming it
+            for block in lies_bloecke(path, READ_BLOCK, streng=True):
+                blocks.append(block)
+                progress(min(0.8, 0.8 * len(blocks) * READ_BLOCK / size), "Reading data")
+            data = np.concatenate(blocks) if blocks else np.empty((0, 3))
+            entry["xyz"] = data[:,0], data[:,1], data[:,2]
+        return entry["xyz"]
+
+# Load the file and grid the heights (worker thread, no matplotlib here)
+    def load_xyz_grid(progress=lambda value, text: None, path=GEO_DATA):
+        entry = cached_entry(path)
+        if "grid" not in entry:
+            x,y,z = extract_xyz_cords(progress, path)
+            progress(0.8, "Preparing grid")
+            x=np.unique(x)
+            y=np.unique(y)
+            if len(z) != len(x) * len(y):
+                raise ValueError("%s: %i points do not form a complete %i×%i grid" % (path, len(z), len(x), len(y)))
+            Z=z.reshape(len(x),len(y))
+            Z=np.transpose(Z)
+            entry["grid"] = x, y, Z
+        progress(0.9, "Drawing")
+        return entry["grid"]
 
     # Destroy tk-frames and Canvas drawing
     def on_closing():
+        app.close_map()
+        app.jobs.schliesse()
         app.destroy()
         exit()
 
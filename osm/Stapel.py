@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+# Viele Modelle in einem Lauf aus einer Auftragsdatei.
+
+# Jede Zeile der Auftragsdatei beschreibt ein Modell:
+#   Basisname  Breite,Länge  Breite,Länge  [kl [kh]]
+# also den Basisnamen der Ausgabedateien, zwei gegenüberliegende
+# Eckpunkte in Dezimalgrad und die horizontale [m] und vertikale [cm]
+# Auflösung (Standard: 1). Leerzeilen und Zeilen ab # werden übergangen.
+# Beispiel:
+#   bochum_mitte  51.4570,7.2150  51.4440,7.2300  5  10
+
+# Oft liegen die Rechtecke nebeneinander oder überlappen sich. Deshalb
+# werden zuerst alle Rechtecke bestimmt und die Vereinigung der
+# benötigten Kacheln genau einmal in einen Kachelspeicher gelesen (siehe
+# Kacheln.py). Die Modelle werden dann parallel in einem Prozesspool
+# erzeugt; die Kachelraster liegen dafür in gemeinsamem Speicher, jeder
+# Auftrag schneidet sein Raster daraus aus und schreibt sein eigenes
+# Protokoll <Basisname>.log.
+
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Kacheln import Kachelspeicher
+from Kachelbestand import Kachelbestand, Katalog, KATALOG
+from Gemeinsam import GemeinsamerSpeicher
+from Exporte import FORMATE
+from Modellbau import (FehlendeDaten, melde, protokoll, koordinaten,
+                       rechteck, kacheln, lade, hoehenbereich, baue_netz,
+                       exportiere_modell)
+
+Auftrag = namedtuple("Auftrag", "name ecken kl kh")
+
+
+def lies_auftraege(pfad):
+    "Liest die Aufträge einer Auftragsdatei"
+    auftraege = []
+    with open(pfad) as datei:
+        for nummer, zeile in enumerate(datei, 1):
+            teile = zeile.split("#")[0].split()
+            if not teile:
+                continue
+            try:
+                if not 3 <= len(teile) <= 5:
+                    raise ValueError("erwartet: Basisname Breite,Länge "
+                                     "Breite,Länge [kl [kh]]")
+                name = teile[0]
+                ecken = koordinaten(teile[1]), koordinaten(teile[2])
+                kl, kh = (list(map(int, teile[3:])) + [1, 1])[:2]
+            except ValueError as fehler:
+                raise ValueError("%s, Zeile %i: %s" % (pfad, nummer, fehler))
+            if name in (auftrag.name for auftrag in auftraege):
+                raise ValueError("%s, Zeile %i: Basisname %s doppelt"
+                                 % (pfad, nummer, name))
+            auftraege.append(Auftrag(name, ecken, kl, kh))
+    return auftraege
+
+
+def erzeuge_auftrag(auftrag, r, pfade, speicher, formate, max_fehler=None,
+                    kompression=None):
+    """Erzeugt ein Modell aus dem Kachelspeicher (im Prozesspool).
+
+    Liefert None oder die Fehlermeldung, die auch im Protokoll steht.
+    Auch andere Fehler als FehlendeDaten (etwa ein OSError beim Schreiben)
+    kommen als Meldung zurück, damit die übrigen Aufträge weiterlaufen."""
+    log = protokoll(auftrag.name, bildschirm=False)
+    try:
+        raster = lade(pfade, r, auftrag.kl, auftrag.kh, cache=speicher,
+                      log=log)
+        minh, maxh, minhs = hoehenbereich(raster, log=log)
+        netz = baue_netz(raster, minh, formate, max_fehler, log=log)
+        exportiere_modell(auftrag.name, formate, raster, netz, minh, maxh,
+                          kompression=kompression, log=log)
+    except FehlendeDaten as fehler:
+        log(str(fehler))
+        return str(fehler)
+    except Exception as fehler:
+        meldung = fehlermeldung(fehler)
+        log(meldung)
+        return meldung
+    log("Programmlauf erfolgreich beendet.\n\n")
+    return None
+
+
+def fehlermeldung(fehler):
+    "Meldung zu einer Ausnahme, auch wenn sie keinen Text hat"
+    return "%s: %s" % (type(fehler).__name__, fehler)
+
+
+def fuehre_aus(auftraege, bestand, formate=None, max_fehler=None,
+               cache=None, pyramide=False, prozesse=1, kontext=None,
+               kompression=None, log=melde):
+    """Erzeugt alle Modelle der Aufträge.
+
+    bestand ist der Kachelbestand (oder Datenordner), cache ein
+    Kachelcache für das erste Lesen der Kacheln. prozesse gilt für das
+    Lesen der Kacheln wie für die Modelle, kompression für alle
+    Textformate aller Modelle. Liefert ein Dictionary
+    Basisname -> None oder Fehlermeldung."""
+    if formate is None:
+        formate = list(FORMATE.values())
+    if not isinstance(bestand, Kachelbestand):
+        bestand = Kachelbestand(bestand, Katalog(KATALOG))
+    ergebnisse = {}
+
+    # Rechtecke und Kacheln aller Aufträge
+    bereit = []
+    for auftrag in auftraege:
+        auftragslog = protokoll(auftrag.name, bildschirm=False)
+        try:
+            auftragslog("Basisname: "+auftrag.name, sichtbar=False)
+            (lat1, lon1), (lat2, lon2) = auftrag.ecken
+            r = rechteck(lat1, lon1, lat2, lon2, log=auftragslog)
+            pfade = kacheln(bestand, r)
+        except FehlendeDaten as fehler:
+            meldung = "%s (%s)" % (fehler, ", ".join(fehler.kacheln))
+            auftragslog(meldung)
+            log("Auftrag %s: %s" % (auftrag.name, meldung))
+            ergebnisse[auftrag.name] = meldung
+            continue
+        except Exception as fehler:
+            # Etwa ein Protokoll, das sich nicht anlegen lässt
+            ergebnisse[auftrag.name] = fehlermeldung(fehler)
+            log("Auftrag %s: %s" % (auftrag.name, ergebnisse[auftrag.name]))
+            continue
+        bereit.append((auftrag, r, pfade))
+
+    # Jede benötigte Kachel wird genau einmal gelesen.
+    alle = dict.fromkeys(pfad for auftrag, r, pfade in bereit
+                         for pfad in pfade)
+    log("%i Aufträge mit zusammen %i XYZ-Dateien" % (len(bereit),
+                                                     len(alle)))
+    speicher = Kachelspeicher(pyramide)
+    speicher.fuelle(alle, {speicher.stufe(a.kl) for a, r, p in bereit},
+                    cache=cache, prozesse=prozesse, kontext=kontext,
+                    log=log)
+
+    prozesse = min(prozesse or os.cpu_count() or 1, len(bereit))
+    if prozesse <= 1:
+        for fertig, (auftrag, r, pfade) in enumerate(bereit, 1):
+            start = time.time()
+            ergebnisse[auftrag.name] = erzeuge_auftrag(
+                auftrag, r, pfade, speicher, formate, max_fehler,
+                kompression)
+            _melde_fertig(log, auftrag, ergebnisse[auftrag.name], fertig,
+                          len(bereit), start)
+        return ergebnisse
+
+    log("Erzeuge %i Modelle mit %i Prozessen" % (len(bereit), prozesse))
+    if kontext is not None:
+        kontext = multiprocessing.get_context(kontext)
+    start = time.time()
+    with GemeinsamerSpeicher() as gemeinsam:
+        geteilt = speicher.teile(gemeinsam)
+        with ProcessPoolExecutor(prozesse, mp_context=kontext) as pool:
+            laufend = {pool.submit(erzeuge_auftrag, auftrag, r, pfade,
+                                   geteilt, formate, max_fehler,
+                                   kompression): auftrag
+                       for auftrag, r, pfade in bereit}
+            for fertig, erledigt in enumerate(as_completed(laufend), 1):
+                auftrag = laufend[erledigt]
+                try:
+                    ergebnisse[auftrag.name] = erledigt.result()
+                except Exception as fehler:
+                    # Etwa ein abgestürzter Arbeitsprozess
+                    # (BrokenProcessPool) oder ein nicht übertragbares
+                    # Ergebnis; die anderen Aufträge zählen trotzdem.
+                    ergebnisse[auftrag.name] = fehlermeldung(fehler)
+                _melde_fertig(log, auftrag, ergebnisse[auftrag.name],
+                              fertig, len(bereit), start)
+    return ergebnisse
+
+
+def _melde_fertig(log, auftrag, fehler, fertig, anzahl, start):
+    if fehler:
+        log("Fehler: %s: %s (%i/%i)" % (auftrag.name, fehler, fertig,
+                                         anzahl))
+    else:
+        log("Fertig: %s (%i/%i, %.1f s)" % (auftrag.name, fertig, anzahl,
+                                            time.time()-start))